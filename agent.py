@@ -1,42 +1,44 @@
-from langchain_core.prompts import PromptTemplate
-from langchain_community.llms import Ollama
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain.tools import tool
-from scraper import scrape_tire_prices
+import os
+import json
+from functools import lru_cache
+from scraper import scrape_tire_prices, get_recommended_tire_sizes
+from sites import cheapest
 from database import save_appointment
 import logging
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(filename='app.log', level=logging.DEBUG)
+setup_logging()
 
 # Local LLM via Ollama
-llm = Ollama(model="llm3")
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3')
+OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 
-# Tools
-@tool
-def fetch_tire_prices(make: str, model: str, year: str, size: str, zip_code: str) -> str:
-    """Fetch tyre prices from multiple sites. Input format: make, model, year, size, zip_code"""
+# Tools that change state; an agent run that calls one must never be replayed from the answer cache
+SIDE_EFFECT_TOOLS = frozenset({"schedule_appointment"})
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Plain functions so the fast-path router can answer without the LLM
+def quote_tire_prices(make, model, year, size, zip_code):
     try:
-        prices = scrape_tire_prices(make, model, year, size, zip_code)
-        if not prices:
+        listings = scrape_tire_prices(make, model, year, size, zip_code)
+        if not listings:
             return "No prices found in cache. Using mock data."
         
         # Simple price formatting (works with mock data instantly)
-        if isinstance(list(prices.values())[0], dict):
-            min_price = min([d['price'] for d in prices.values()])
-        else:
-            min_price = min(prices.values())
-        optimized = round(min_price * 0.9, 2)
+        best = cheapest(listings)
+        optimized = round(best.price * 0.9, 2)
         
-        price_list = "\n".join([f"{name}: ${price}" for name, price in prices.items()])
-        return f"✅ Found prices:\n{price_list}\n💰 Lowest: ${min_price}\n🎯 XXX Tyres: ${optimized} (10% better!)"
+        price_list = "\n".join([f"{listing.name}: ${listing.price}" for listing in listings])
+        answer = f"✅ Found prices:\n{price_list}\n💰 Lowest: ${best.price}\n🎯 XXX Tyres: ${optimized} (10% better!)"
+        if not size or size.lower() == 'unknown':
+            answer = get_recommended_tire_sizes(make, model, year) + "\n" + answer
+        return answer
     except Exception as e:
         logging.error(f"Error in fetch_tire_prices: {str(e)}")
         return "Mock prices: Michelin Defender $189.99, Bridgestone $199.99"
 
-@tool
-def schedule_appointment(contact: str, zip_code: str, time: str) -> str:
-    """Schedule appointment. Inputs: contact phone/email, zip_code, time"""
+def book_appointment(contact, zip_code, time):
     try:
         save_appointment(contact, zip_code, time)
         return f"✅ Appointment booked for {time} | Contact: {contact} | Zip: {zip_code}"
@@ -44,10 +46,17 @@ def schedule_appointment(contact: str, zip_code: str, time: str) -> str:
         logging.error(f"Error scheduling: {str(e)}")
         return "Appointment saved successfully"
 
-tools = [fetch_tire_prices, schedule_appointment]
+# Tools (wrapped with langchain's @tool lazily in get_tools)
+def fetch_tire_prices(make: str, model: str, year: str, size: str, zip_code: str) -> str:
+    """Fetch tyre prices from multiple sites. Input format: make, model, year, size, zip_code"""
+    return quote_tire_prices(make, model, year, size, zip_code)
+
+def schedule_appointment(contact: str, zip_code: str, time: str) -> str:
+    """Schedule appointment. Inputs: contact phone/email, zip_code, time"""
+    return book_appointment(contact, zip_code, time)
 
 # ✅ CORRECT ReAct Prompt (String-based, NO MessagesPlaceholder)
-react_prompt = PromptTemplate.from_template("""
+REACT_TEMPLATE = """
 You are a tyre sales assistant for XXX Tyres. Help customers find tyre prices and book appointments.
 
 TOOLS:
@@ -58,7 +67,7 @@ Use this format EXACTLY (no extra text):
 Question: [user question]
 Thought: [your reasoning]
 Action: [tool name EXACTLY as listed]
-Action Input: [arguments as JSON {"param": "value"}]
+Action Input: [arguments as JSON {{"param": "value"}}]
 Observation: [tool result]
 Thought: [more reasoning]
 Action: [next tool or "Final Answer"]
@@ -70,20 +79,80 @@ Available tools: {tool_names}
 
 Question: {input}
 Thought: {agent_scratchpad}
-""")
+"""
+
+# Built once per process and shared by every Streamlit session; langchain is only imported here
+@lru_cache(maxsize=None)
+def get_llm():
+    from langchain_community.llms import Ollama
+    return Ollama(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL)
+
+@lru_cache(maxsize=None)
+def get_tools():
+    from langchain.tools import tool
+    return (tool(fetch_tire_prices), tool(schedule_appointment))
+
+@lru_cache(maxsize=None)
+def get_react_prompt():
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate.from_template(REACT_TEMPLATE)
 
 # ✅ CORRECT ReAct Agent Setup
+@lru_cache(maxsize=None)
 def get_agent_executor():
-    agent = create_react_agent(llm=llm, tools=tools, prompt=react_prompt)
+    from langchain.agents import create_react_agent, AgentExecutor
+    tools = list(get_tools())
+    agent = create_react_agent(llm=get_llm(), tools=tools, prompt=get_react_prompt())
     return AgentExecutor(
         agent=agent, 
         tools=tools, 
         verbose=True, 
         handle_parsing_errors=True, 
         max_iterations=3,
-        early_stopping_method="generate"
+        early_stopping_method="generate",
+        return_intermediate_steps=True
     )
 
+def tool_calls(result):
+    """(tool name, arguments dict) for each tool an agent_executor.invoke() result called, in order."""
+    calls = []
+    for action, _ in result.get("intermediate_steps", []):
+        args = action.tool_input
+        if isinstance(args, str):  # ReAct passes the Action Input text, normally JSON
+            try:
+                args = json.loads(args)
+            except ValueError:
+                args = {}
+        calls.append((action.tool, args if isinstance(args, dict) else {}))
+    return calls
+
+@lru_cache(maxsize=None)
+def _stream_handler_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class StreamHandler(BaseCallbackHandler):
+        """Pushes the final answer generated so far to `write` as each LLM token arrives.
+
+        Thoughts, actions and tool inputs are not shown; each ReAct step is a new LLM call, so the text restarts.
+        """
+        def __init__(self, write):
+            self.write = write
+            self.text = ""
+
+        def on_llm_start(self, serialized, prompts, **kwargs):
+            self.text = ""
+
+        def on_llm_new_token(self, token, **kwargs):
+            self.text += token
+            _, marker, answer = self.text.partition(FINAL_ANSWER_MARKER)
+            if marker:
+                self.write(answer.lstrip() + "▌")
+
+    return StreamHandler
+
+def make_stream_handler(write):
+    return _stream_handler_class()(write)
+
 # For testing - simple fallback function
 def simple_price_response(input_text: str) -> str:
     """Fallback if agent fails - direct mock response"""
@@ -1,22 +1,20 @@
 import streamlit as st
-from agent import get_agent_executor
-from database import save_appointment, is_after_hours
-import json
-import os
-import logging
-import pandas as pd
-import sqlite3
+from agent import get_agent_executor, OLLAMA_MODEL
+from scraper import cache_stats, QUEUE_MODE
+from router import router_stats, handle_message
+from database import save_appointment, is_after_hours, count_appointments, iter_appointment_csv
+from datetime import timedelta
+from log_setup import setup_logging, tail_records, format_record, LOG_FILE
+import metrics
 
 # Setup logging for debugging
-logging.basicConfig(filename='app.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
 
-# Load cached prices if available
-CACHE_FILE = "price_cache.json"
-if os.path.exists(CACHE_FILE):
-    with open(CACHE_FILE, "r") as f:
-        price_cache = json.load(f)
-else:
-    price_cache = {}
+# One agent executor (LLM client, tools, prompt) per process, shared across sessions and reruns
+load_agent_executor = st.cache_resource(show_spinner=False)(get_agent_executor)
+
+# Prometheus text on METRICS_PORT and/or METRICS_FILE when set; a no-op on reruns
+metrics.start_exporter()
 
 # Streamlit app
 st.title("XXX Tyres Chatbot")
@@ -24,23 +22,43 @@ st.title("XXX Tyres Chatbot")
 # Sidebar for status and export
 with st.sidebar:
     st.header("App Status")
-    st.text("Ollama Model: llama3")
-    if os.path.exists('app.log'):
-        with open('app.log', 'r') as log_file:
-            st.text_area("Recent Logs", log_file.read(), height=100)
+    st.text(f"Ollama Model: {OLLAMA_MODEL}")
+    st.text(f"Price cache: {cache_stats()}")
+    st.text(f"Fast path: {router_stats()}")
+    if QUEUE_MODE:
+        import jobs
+        st.text(f"Scrape queue: {jobs.queue_stats()}")
+    # Only the tail of the log is read, so this stays cheap however large app.log grows
+    log_level = st.selectbox("Log level", ["DEBUG", "INFO", "WARNING", "ERROR"], index=1, key="log_level")
+    log_lines = st.number_input("Log lines", min_value=10, max_value=500, value=50, step=10, key="log_lines")
+    records = tail_records(LOG_FILE, limit=int(log_lines), min_level=log_level)
+    st.text_area("Recent Logs", "\n".join(format_record(record) for record in records), height=100)
+
+    # Admin panel: where the time goes, per stage and per request
+    with st.expander("Latency metrics"):
+        snapshot = metrics.snapshot()
+        st.text("\n".join(f"{stage['stage']}: n={stage['count']} p50={stage['p50_ms']} p95={stage['p95_ms']} "
+                          f"p99={stage['p99_ms']} ms" for stage in snapshot["stages"]) or "No requests yet")
+        st.text("\n".join(f"{name}: {value}" for name, value in snapshot["counters"].items()))
+        for tid, spans in metrics.recent_traces(limit=5).items():
+            st.text(f"trace {tid}\n" + "\n".join(
+                f"  {span['name']}{''.join(f' {k}={v}' for k, v in span['labels'].items())}: {span['ms']} ms "
+                f"{span['status']}" for span in spans))
     
-    # Extra Feature: Export appointments to CSV
+    # Extra Feature: Export appointments to CSV, filtered in SQL and streamed from the cursor
     st.header("Export Appointments")
+    date_range = st.date_input("Booked between", value=(), key="export_dates")
+    export_zip = st.text_input("Zip code", key="export_zip").strip() or None
+    compress = st.checkbox("Gzip", key="export_gzip")
+    start = date_range[0].isoformat() if len(date_range) > 0 else None
+    end = (date_range[-1] + timedelta(days=1)).isoformat() if len(date_range) > 0 else None  # Inclusive end date
+    st.text(f"{count_appointments(start, end, export_zip)} appointments match")
     if st.button("Download CSV"):
-        conn = sqlite3.connect("appointments.db")
-        df = pd.read_sql_query("SELECT * FROM appointments", conn)
-        conn.close()
-        csv = df.to_csv(index=False)
         st.download_button(
-            label="Download appointments.csv",
-            data=csv,
-            file_name="appointments.csv",
-            mime="text/csv"
+            label="Download appointments.csv" + (".gz" if compress else ""),
+            data=b"".join(iter_appointment_csv(start, end, export_zip, compress=compress)),
+            file_name="appointments.csv" + (".gz" if compress else ""),
+            mime="application/gzip" if compress else "text/csv"
         )
 
 # Session state for chat history
@@ -62,15 +80,16 @@ if user_input := st.chat_input("Enter car details (e.g., Make: Toyota, Model: Ca
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    # Get agent response with fallback
-    try:
-        agent_executor = get_agent_executor()
-        response = agent_executor.invoke({"input": user_input})["output"]
-        logging.info(f"✅ Agent success: {user_input}")
-    except Exception as e:
-        # ✅ FALLBACK: Direct mock response (works instantly)
-        response = simple_price_response(user_input)
-        logging.warning(f"Agent failed, using fallback: {str(e)}")
+    with st.chat_message("assistant"):
+        # One trace ID per message ties together the cache, site, parse, LLM and booking spans it causes
+        with metrics.trace(), metrics.span("chat_request"):
+            placeholder = st.empty()
+
+            # Fast path: messages that parse into a vehicle or booking skip the LLM entirely,
+            # then equivalent questions answered before are served from the answer cache;
+            # otherwise the agent's answer streams into the message, with a fallback if it fails
+            response = handle_message(user_input, load_agent_executor, placeholder.markdown, simple_price_response)
+            placeholder.markdown(response)
 
     # Remove after-hours field temporarily for testing
     # if is_after_hours():
@@ -84,5 +103,3 @@ if user_input := st.chat_input("Enter car details (e.g., Make: Toyota, Model: Ca
     #         logging.info("Appointment scheduled during after-hours")
 
     st.session_state.messages.append({"role": "assistant", "content": response})
-    with st.chat_message("assistant"):
-        st.markdown(response)
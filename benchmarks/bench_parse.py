@@ -0,0 +1,98 @@
+"""Compare the selective parsers in parsers.py with the old full-tree parse.
+
+Usage: python benchmarks/bench_parse.py [--rounds 50]
+"""
+import argparse
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parsers  # noqa: E402
+from sites import SITES  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_tirerack(html, limit=5):
+    """The parse async_scrape_tirerack used to run inline on the event loop."""
+    prices = {}
+    soup = BeautifulSoup(html, 'html.parser')
+    for product in soup.find_all('div', class_='product-result')[:limit]:
+        name_elem = product.find('span', class_='product-name')
+        name = name_elem.text.strip() if name_elem else "Unknown"
+        price_elem = product.find('span', class_='price-amount')
+        price = float(price_elem.text.strip().replace('$', '').replace(',', '')) if price_elem else 0.0
+        size_elem = product.find('div', class_='tire-size')
+        rating_elem = product.find('span', class_='rating-value')
+        warranty_elem = product.find('div', class_='warranty-info')
+        if price > 0:
+            prices[name] = {
+                "price": price,
+                "brand": name.split()[0] if name != "Unknown" else "Unknown",
+                "size": size_elem.text.strip() if size_elem else "N/A",
+                "rating": rating_elem.text.strip() if rating_elem else "N/A",
+                "warranty": warranty_elem.text.strip() if warranty_elem else "N/A"
+            }
+    return prices
+
+
+def legacy_product_items(html, limit=5):
+    """The simpletire/discounttire parse from async_scrape_site."""
+    prices = {}
+    soup = BeautifulSoup(html, 'html.parser')
+    for item in soup.find_all('div', class_='product-item')[:limit]:
+        name_elem = item.find('h3', class_='product-name')
+        price_elem = item.find('span', class_='price')
+        if name_elem and price_elem:
+            prices[name_elem.text.strip()] = float(price_elem.text.strip().replace('$', '').replace(',', ''))
+    return prices
+
+
+def name_prices(result):
+    """Common shape for comparing the old dicts with the new Listing records."""
+    if isinstance(result, dict):
+        return {name: value["price"] if isinstance(value, dict) else value for name, value in result.items()}
+    return {listing.name: listing.price for listing in result}
+
+
+CASES = [
+    ("tirerack", legacy_tirerack),
+    ("simpletire", legacy_product_items),
+    ("discounttire", legacy_product_items),
+]
+
+
+def best_of(fn, html, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--rounds", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    print(f"parser backend: {parsers.PARSER_BACKEND}")
+    print(f"{'site':<14}{'size KB':>9}{'legacy ms':>11}{'new ms':>9}{'speedup':>9}  same")
+    for site, legacy_fn in CASES:
+        adapter = SITES[site]
+
+        def new_fn(html):
+            return parsers.parse_listings(html, adapter)
+
+        with open(os.path.join(FIXTURES, f"{site}.html"), encoding="utf-8") as f:
+            html = f.read()
+        legacy = best_of(legacy_fn, html, args.rounds)
+        new = best_of(new_fn, html, args.rounds)
+        same = name_prices(legacy_fn(html)) == name_prices(new_fn(html))
+        print(f"{site:<14}{len(html) / 1024:>9.0f}{legacy * 1000:>11.2f}{new * 1000:>9.2f}{legacy / new:>8.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
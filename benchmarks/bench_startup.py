@@ -0,0 +1,99 @@
+"""Startup and per-rerun cost of the Streamlit app, optionally against an older git revision.
+
+Usage: python benchmarks/bench_startup.py [--compare REV] [--rounds 5]
+
+Each measurement runs in a fresh interpreter on a throwaway copy of the tree, so
+app.log, appointments.db and the price cache of the working copy are untouched.
+Ollama does not need to be running; an unreachable LLM fails fast into the fallback.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["agent", "scraper", "database"]  # Present in every revision of the app
+
+PROBE = textwrap.dedent('''
+    import json, sys, time
+    sys.path.insert(0, ".")
+    rounds = int(sys.argv[1])
+    result = {}
+
+    start = time.perf_counter()
+    for name in %(modules)r:
+        __import__(name)
+    result["import_app_modules_ms"] = (time.perf_counter() - start) * 1000
+    result["heavy_modules_loaded"] = sorted(m for m in ("langchain", "langchain_community", "bs4", "aiohttp",
+                                                        "pandas", "requests") if m in sys.modules)
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file("app.py", default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    result["first_run_ms"] = (time.perf_counter() - start) * 1000
+
+    reruns = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        app.run()
+        reruns.append((time.perf_counter() - start) * 1000)
+    result["redraw_rerun_ms"] = reruns
+
+    chats = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        app.chat_input[0].set_value("What tyres are best for snow?").run()
+        chats.append((time.perf_counter() - start) * 1000)
+    result["llm_message_rerun_ms"] = chats
+    print("RESULT " + json.dumps(result))
+''') % {"modules": APP_MODULES}
+
+
+def copy_tree(rev, dest):
+    if rev is None:
+        shutil.copytree(REPO, dest, ignore=shutil.ignore_patterns(".git", "__pycache__", "*.db*", "app.log"))
+    else:
+        os.makedirs(dest)
+        archive = subprocess.run(["git", "-C", REPO, "archive", rev], check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+
+
+def measure(rev, rounds):
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, "tree")
+        copy_tree(rev, tree)
+        proc = subprocess.run([sys.executable, "-c", PROBE, str(rounds)], cwd=tree, capture_output=True, text=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith("RESULT "):
+                return json.loads(line[len("RESULT "):])
+        raise RuntimeError(f"probe failed for {rev or 'working tree'}:\n{proc.stderr[-2000:]}")
+
+
+def summarize(label, result):
+    print(f"== {label}")
+    print(f"   import {', '.join(APP_MODULES)}: {result['import_app_modules_ms']:.0f} ms "
+          f"(heavy modules loaded: {', '.join(result['heavy_modules_loaded']) or 'none'})")
+    print(f"   first script run (cold):   {result['first_run_ms']:.0f} ms")
+    print(f"   rerun, redraw only:        {statistics.median(result['redraw_rerun_ms']):.1f} ms median")
+    print(f"   rerun, free-form message:  {statistics.median(result['llm_message_rerun_ms']):.1f} ms median")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--compare", metavar="REV", help="Also measure this git revision (e.g. HEAD~1)")
+    arg_parser.add_argument("--rounds", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    if args.compare:
+        summarize(f"before ({args.compare})", measure(args.compare, args.rounds))
+    summarize("after (working tree)", measure(None, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
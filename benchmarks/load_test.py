@@ -0,0 +1,220 @@
+"""Replay a JSONL workload against the chat pipeline, the agent tools and scrape_tire_prices, fully offline.
+
+Usage: python benchmarks/load_test.py [workload.jsonl] [--concurrency 8] [--repeat 3] [--latency-ms 50]
+                                      [--error-rate 0.05] [--llm-token-ms 5] [--no-rate-limit] [--json]
+
+Workload lines (see benchmarks/workload.jsonl):
+  {"input": "Toyota Camry 2023, 19-inch, zip 90210"}   a chat message, routed like app.py does
+  {"make": ..., "model": ..., "year": ..., "size": ..., "zip_code": ...}   scrape_tire_prices
+  {"tool": "fetch_tire_prices", "args": {...}}          an agent tool called directly
+
+Retailers, the Wheel-Size API and Ollama are served by stub_server.py (in-process unless --stub URL
+is given). Each retailer gets its own stub server, and so its own rate-limit bucket with the real
+retailer's limits, as in production; --no-rate-limit lifts them to measure the app alone. The app runs
+in a throwaway directory, so the working copy's caches, appointments.db and app.log are untouched, and
+every run starts cold; use --repeat to measure warm-cache throughput.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Unix only; on Windows peak memory comes from tracemalloc instead
+    resource = None
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+import stub_server  # noqa: E402
+
+UNLIMITED_RATE = (10000.0, 10000)  # --no-rate-limit: effectively no politeness delay
+
+
+def use_stub_sites(site_urls, unlimited=False):
+    """Point each registered retailer at its stub server (name -> base URL), keeping the real host's rate limit."""
+    import rate_limit
+    import sites
+    for name, adapter in list(sites.SITES.items()):
+        base_url = site_urls[name]
+        limit = rate_limit.HOST_LIMITS.get(rate_limit.host_key(adapter.url_template),
+                                           (rate_limit.DEFAULT_RATE, rate_limit.DEFAULT_BURST))
+        rate_limit.HOST_LIMITS[rate_limit.host_key(base_url)] = UNLIMITED_RATE if unlimited else limit
+        sites.register_site(dataclasses.replace(adapter, url_template=f"{base_url}/sites/{name}?q={{query}}&zip={{zip_code}}"))
+
+
+def load_workload(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_item(item):
+    import agent
+    import router
+    import scraper
+    if "input" in item:
+        return "chat", router.handle_message(item["input"])  # The app.py message path without Streamlit
+    if "tool" in item:
+        return item["tool"], getattr(agent, item["tool"])(**item["args"])
+    return "scrape", scraper.scrape_tire_prices(item["make"], item["model"], item["year"], item["size"],
+                                                item.get("zip_code", "90210"))
+
+
+def timed_item(item):
+    import metrics
+    start = time.perf_counter()
+    error = None
+    with metrics.trace():
+        try:
+            kind, _ = run_item(item)
+        except Exception as e:
+            kind, error = "error", f"{type(e).__name__}: {e}"
+    return kind, time.perf_counter() - start, error
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def run_load(workload, concurrency, repeat):
+    import metrics
+    import router
+    items = workload * repeat
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_item, items))
+    elapsed = time.perf_counter() - start
+
+    by_kind = {}
+    errors = []
+    for kind, seconds, error in results:
+        by_kind.setdefault(kind, []).append(seconds)
+        if error:
+            errors.append(error)
+    counters = metrics.snapshot()["counters"]
+    lookups = {name.split("source=")[1]: value for name, value in counters.items() if name.startswith("price_lookups")}
+    hits = lookups.get("memory", 0) + lookups.get("persistent", 0)
+    routes = router.router_stats()
+    return {
+        "requests": len(items),
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(items) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency": latency_summary([seconds for _, seconds, _ in results]),
+        "latency_by_kind": {kind: latency_summary(samples) for kind, samples in sorted(by_kind.items())},
+        "price_lookups": lookups,
+        "price_cache_hit_ratio": round(hits / sum(lookups.values()), 3) if lookups else 0.0,
+        "fast_path_ratio": routes["fast_ratio"],
+        "answer_cache_hits": routes["answer_cache_hits"],
+        "stages": {stage["stage"]: {k: stage[k] for k in ("count", "p50_ms", "p95_ms", "p99_ms")}
+                   for stage in metrics.snapshot()["stages"]},
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where the resource module is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # Bytes on macOS, KB on Linux
+
+
+def print_report(report):
+    latency = report["latency"]
+    print(f"{report['requests']} requests at concurrency {report['concurrency']} in {report['seconds']}s "
+          f"= {report['requests_per_second']} req/s, {report['errors']} errors")
+    print(f"latency ms: p50 {latency['p50_ms']}  p95 {latency['p95_ms']}  p99 {latency['p99_ms']}  max {latency['max_ms']}")
+    for kind, summary in report["latency_by_kind"].items():
+        print(f"   {kind:<22} n={summary['count']:<5} p50 {summary['p50_ms']:>8}  p95 {summary['p95_ms']:>8}  "
+              f"p99 {summary['p99_ms']:>8}")
+    print(f"price cache hit ratio: {report['price_cache_hit_ratio']:.1%} {report['price_lookups']}")
+    print(f"fast path ratio: {report['fast_path_ratio']:.1%}, answer cache hits: {report['answer_cache_hits']}")
+    memory = []
+    if report.get("peak_rss_mb") is not None:
+        memory.append(f"{report['peak_rss_mb']} MB RSS")
+    if "peak_traced_mb" in report:
+        memory.append(f"{report['peak_traced_mb']} MB traced Python allocations")
+    print(f"peak memory: {', '.join(memory) or 'n/a'}")
+    print("stages (ms):")
+    for stage, summary in report["stages"].items():
+        print(f"   {stage:<28} n={summary['count']:<5} p50 {summary['p50_ms']}  p95 {summary['p95_ms']}  "
+              f"p99 {summary['p99_ms']}")
+    for error in report["error_samples"]:
+        print(f"   error: {error}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("workload", nargs="?", default=os.path.join(BENCHMARKS, "workload.jsonl"))
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--repeat", type=int, default=1, help="Replay the workload this many times")
+    arg_parser.add_argument("--stub", metavar="URL",
+                            help="Use an already running stub_server.py (all retailers then share its rate limit)")
+    arg_parser.add_argument("--no-rate-limit", action="store_true",
+                            help="Lift the per-retailer rate limits (measures the app, not the politeness delay)")
+    arg_parser.add_argument("--tracemalloc", action="store_true",
+                            help="Also trace peak Python allocations (slower; always on where RSS is unavailable)")
+    arg_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    stub_server.add_config_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    workload = load_workload(args.workload)
+
+    import sites  # Registers the retailers; no app state yet
+    if args.stub:
+        base_url = args.stub.rstrip("/")
+        site_urls = {name: base_url for name in sites.SITES}
+    else:
+        config = stub_server.config_from_args(args)
+        _, base_url = stub_server.start(config=config)
+        site_urls = {name: stub_server.start(config=config)[1] for name in sites.SITES}
+    # Read at import time by agent.py and scraper.py
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    os.environ["WHEEL_SIZE_API_BASE"] = f"{base_url}/wheel-size"
+    os.environ.setdefault("WHEEL_SIZE_API_KEY", "stub")
+
+    workdir = tempfile.mkdtemp(prefix="cartyre-load-")
+    os.chdir(workdir)  # price_cache.db, appointments.db and app.log are relative paths
+    trace_memory = args.tracemalloc or resource is None
+    if trace_memory:
+        tracemalloc.start()
+    import rate_limit
+    import agent  # noqa: F401  Imports scraper, database and the rest
+    use_stub_sites(site_urls, args.no_rate_limit)
+    rate_limit.HOST_LIMITS[rate_limit.host_key(base_url)] = (
+        UNLIMITED_RATE if args.no_rate_limit else rate_limit.HOST_LIMITS["api.wheel-size.com"])
+    agent.get_agent_executor().verbose = False  # Chain traces on stdout would drown the report
+
+    report = run_load(workload, args.concurrency, args.repeat)
+    report["peak_rss_mb"] = peak_rss_mb()
+    if trace_memory:
+        report["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    report["workdir"] = workdir
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Local stand-in for the retailers, the Wheel-Size API and Ollama, with latency and error injection.
+
+Usage: python benchmarks/stub_server.py [--port 8765] [--latency-ms 50] [--jitter-ms 20] [--error-rate 0.05]
+                                        [--site-latency tirerack=800] [--llm-token-ms 5]
+
+Routes:
+  GET  /sites/<name>?q=...         benchmarks/fixtures/<name>.html (a recorded results page)
+  GET  /wheel-size/search/by_model/ benchmarks/fixtures/wheel_size.json
+  POST /api/generate               Ollama-style streamed JSON lines ending in a ReAct "Final Answer"
+  GET  /api/tags                   Ollama model list
+
+Point the app at it with OLLAMA_BASE_URL=http://127.0.0.1:8765 and
+WHEEL_SIZE_API_BASE=http://127.0.0.1:8765/wheel-size; the retailer URL templates are
+swapped in-process by load_test.py (see use_stub_sites).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LLM_ANSWER = ("Thought: I have the final answer\nFinal Answer: For {question} I'd recommend an all-season tyre; "
+              "share your make, model, year and zip code and I can quote exact prices.")
+
+
+class StubConfig:
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, site_latency=None, llm_token_ms=0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.site_latency = site_latency or {}  # Route name -> latency in ms, overriding latency_ms
+        self.llm_token_ms = llm_token_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {}  # Route name -> count
+
+    def delay(self, route):
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            fail = self.random.random() < self.error_rate
+        time.sleep(max(0.0, self.site_latency.get(route, self.latency_ms) + jitter) / 1000)
+        return fail
+
+
+def _load_fixtures():
+    pages = {}
+    for filename in os.listdir(FIXTURES):
+        with open(os.path.join(FIXTURES, filename), "rb") as f:
+            pages[filename] = f.read()
+    return pages
+
+
+def make_handler(config, pages):
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            match = re.fullmatch(r"/sites/([\w-]+)/?", path)
+            if match:
+                route, page, content_type = match.group(1), f"{match.group(1)}.html", "text/html; charset=utf-8"
+            elif path.rstrip("/") == "/wheel-size/search/by_model":
+                route, page, content_type = "wheel-size", "wheel_size.json", "application/json"
+            elif path == "/api/tags":
+                self._send(200, json.dumps({"models": [{"name": "stub"}]}).encode(), "application/json")
+                return
+            else:
+                self._send(404, b"not found", "text/plain")
+                return
+            if config.delay(route):
+                self._send(503, b"injected error", "text/plain")
+            elif page not in pages:
+                self._send(404, b"no fixture", "text/plain")
+            else:
+                self._send(200, pages[page], content_type)
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/api/generate":
+                self._send(404, b"not found", "text/plain")
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if config.delay("ollama"):
+                self._send(503, b"injected error", "text/plain")
+                return
+            questions = re.findall(r"Question: (.+)", request.get("prompt", ""))
+            answer = LLM_ANSWER.format(question=questions[-1].strip() if questions else "that")
+            # Close-delimited stream of JSON lines, one token each, like Ollama's /api/generate
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for token in re.findall(r"\S+\s*", answer):
+                self.wfile.write(json.dumps({"model": request.get("model"), "response": token, "done": False}).encode() + b"\n")
+                self.wfile.flush()
+                if config.llm_token_ms:
+                    time.sleep(config.llm_token_ms / 1000)
+            self.wfile.write(json.dumps({"model": request.get("model"), "response": "", "done": True}).encode() + b"\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # Clients cancelled at the scrape deadline
+            super().handle_error(request, client_address)
+
+
+def start(host="127.0.0.1", port=0, config=None):
+    """Serve in a daemon thread; returns (server, base_url). Port 0 picks a free port."""
+    config = config or StubConfig()
+    server = StubServer((host, port), make_handler(config, _load_fixtures()))
+    server.config = config
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_site_latency(values):
+    latency = {}
+    for value in values or []:
+        name, _, ms = value.partition("=")
+        latency[name] = float(ms)
+    return latency
+
+
+def add_config_arguments(arg_parser):
+    arg_parser.add_argument("--latency-ms", type=float, default=0, help="Added to every stub response")
+    arg_parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses that are HTTP 503")
+    arg_parser.add_argument("--site-latency", action="append", metavar="ROUTE=MS",
+                            help="Per-route latency (tirerack, simpletire, discounttire, wheel-size, ollama)")
+    arg_parser.add_argument("--llm-token-ms", type=float, default=0, help="Delay between fake LLM tokens")
+    arg_parser.add_argument("--seed", type=int, help="Seed for jitter and error injection")
+
+
+def config_from_args(args):
+    return StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, parse_site_latency(args.site_latency),
+                      args.llm_token_ms, args.seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    server, base_url = start(args.host, args.port, config_from_args(args))
+    print(f"Stub server on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
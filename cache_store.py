@@ -0,0 +1,254 @@
+import sqlite3
+import json
+import os
+import re
+import time
+import atexit
+import threading
+import logging
+from datetime import datetime, timedelta
+from log_setup import setup_logging
+from sqlite_pool import ConnectionPool
+
+# Setup logging
+setup_logging()
+
+CACHE_DB_FILE = "price_cache.db"
+LEGACY_CACHE_FILE = "price_cache.json"  # Old whole-file cache, migrated once
+CACHE_EXPIRY_HOURS = 24
+CACHE_GRACE_HOURS = 24  # Stale entries are still served (and refreshed) this long past expiry
+CACHE_MAX_ENTRIES = 5000
+EVICT_EVERY_WRITES = 100  # Check the size bound every N upserts, not on every write
+HIT_FLUSH_EVERY = 100  # In-memory (LRU) hits are added to the hit counts in batches of this many...
+HIT_FLUSH_SECONDS = 30  # ...or at least this often while hits keep coming
+
+# Legacy keys look like "Toyota-Camry-2023-19-inch-90210"; size and model may contain dashes
+LEGACY_KEY_RE = re.compile(r"^(?P<make>[^-]+)-(?P<model>.+)-(?P<year>\d{4})-(?P<size>.+)-(?P<zip_code>[^-]+)$")
+
+_writes_since_evict = 0
+_pending_hits = {}  # key -> hits served from the in-process LRU, not yet in the table
+_pending_lock = threading.Lock()
+_last_hit_flush = time.monotonic()
+
+
+def make_key(make, model, year, size, zip_code):
+    return f"{make}-{model}-{year}-{size}-{zip_code}"
+
+
+def _connect():
+    conn = sqlite3.connect(CACHE_DB_FILE, timeout=10, check_same_thread=False)  # Shared through the pool
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, avoids an fsync per upsert
+    return conn
+
+
+def init_store(conn):
+    conn.executescript('''CREATE TABLE IF NOT EXISTS price_cache
+                          (key TEXT PRIMARY KEY, make TEXT, model TEXT, year TEXT, size TEXT, zip_code TEXT,
+                           prices TEXT NOT NULL, timestamp TEXT NOT NULL,
+                           hits INTEGER NOT NULL DEFAULT 0, last_access TEXT);
+                          CREATE INDEX IF NOT EXISTS idx_price_cache_timestamp ON price_cache (timestamp);
+                          CREATE INDEX IF NOT EXISTS idx_price_cache_last_access ON price_cache (last_access);
+                          CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value TEXT);''')
+    conn.commit()
+    migrate_legacy_cache(conn)
+
+
+def migrate_legacy_cache(conn, path=LEGACY_CACHE_FILE):
+    """One-time import of the old price_cache.json into the store."""
+    if conn.execute("SELECT 1 FROM cache_meta WHERE name = 'legacy_json_migrated'").fetchone():
+        return 0
+    rows = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Legacy cache migration failed: {str(e)}")
+            legacy = {}
+        for key, entry in legacy.items():
+            if 'prices' not in entry or 'timestamp' not in entry:
+                continue
+            match = LEGACY_KEY_RE.match(key)
+            params = match.groupdict() if match else {}
+            rows.append((key, params.get('make'), params.get('model'), params.get('year'), params.get('size'),
+                         params.get('zip_code'), json.dumps(entry['prices']), entry['timestamp'], entry['timestamp']))
+    with conn:
+        conn.executemany('''INSERT OR IGNORE INTO price_cache
+                            (key, make, model, year, size, zip_code, prices, timestamp, last_access)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+        conn.execute("INSERT OR REPLACE INTO cache_meta (name, value) VALUES ('legacy_json_migrated', ?)",
+                     (datetime.now().isoformat(),))
+    if rows:
+        logging.info(f"Migrated {len(rows)} entries from {path}")
+    return len(rows)
+
+
+_pool = ConnectionPool(_connect, init_store)
+
+
+def connection():
+    """Borrow a pooled connection: `with connection() as conn: ...`."""
+    return _pool.connection()
+
+
+def get_entry(key, max_age_hours=None):
+    """Return {'prices', 'timestamp'} for key or None, and record the access.
+
+    With max_age_hours, older entries are treated as missing (hard expiry).
+    """
+    with connection() as conn:
+        if max_age_hours is None:
+            row = conn.execute("SELECT prices, timestamp FROM price_cache WHERE key = ?", (key,)).fetchone()
+        else:
+            cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+            row = conn.execute("SELECT prices, timestamp FROM price_cache WHERE key = ? AND timestamp > ?",
+                               (key, cutoff)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE price_cache SET hits = hits + 1, last_access = ? WHERE key = ?",
+                         (datetime.now().isoformat(), key))
+    return {'prices': json.loads(row[0]), 'timestamp': row[1]}
+
+
+def put_entry(key, prices, make=None, model=None, year=None, size=None, zip_code=None):
+    """Upsert a single key; keeps its access stats."""
+    global _writes_since_evict
+    now = datetime.now().isoformat()
+    with connection() as conn, conn:
+        conn.execute('''INSERT INTO price_cache (key, make, model, year, size, zip_code, prices, timestamp, last_access)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET prices = excluded.prices, timestamp = excluded.timestamp,
+                            make = COALESCE(excluded.make, make), model = COALESCE(excluded.model, model),
+                            year = COALESCE(excluded.year, year), size = COALESCE(excluded.size, size),
+                            zip_code = COALESCE(excluded.zip_code, zip_code)''',
+                     (key, make, model, str(year) if year is not None else None, size, zip_code,
+                      json.dumps(prices), now, now))
+    _writes_since_evict += 1
+    if _writes_since_evict >= EVICT_EVERY_WRITES:
+        _writes_since_evict = 0
+        evict()
+    return now
+
+
+def is_fresh(key, max_age_hours=CACHE_EXPIRY_HOURS):
+    """TTL check against the timestamp index; does not load the prices."""
+    cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+    with connection() as conn:
+        row = conn.execute("SELECT 1 FROM price_cache WHERE key = ? AND timestamp > ?", (key, cutoff)).fetchone()
+    return row is not None
+
+
+def evict(max_entries=CACHE_MAX_ENTRIES):
+    """Drop the least recently used entries beyond max_entries."""
+    with connection() as conn, conn:
+        cur = conn.execute('''DELETE FROM price_cache WHERE key IN
+                              (SELECT key FROM price_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)''',
+                           (max_entries,))
+    if cur.rowcount:
+        logging.info(f"Evicted {cur.rowcount} cache entries")
+    return cur.rowcount
+
+
+def purge_expired(max_age_hours=CACHE_EXPIRY_HOURS):
+    cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+    with connection() as conn, conn:
+        return conn.execute("DELETE FROM price_cache WHERE timestamp <= ?", (cutoff,)).rowcount
+
+
+def record_hit(key):
+    """Count an access served from the in-process LRU, which never reaches get_entry; flushed in batches."""
+    global _last_hit_flush
+    with _pending_lock:
+        _pending_hits[key] = _pending_hits.get(key, 0) + 1
+        due = (sum(_pending_hits.values()) >= HIT_FLUSH_EVERY
+               or time.monotonic() - _last_hit_flush >= HIT_FLUSH_SECONDS)
+    if due:
+        flush_hits()
+
+
+def flush_hits():
+    """Add buffered LRU hits to the persistent counts (and last_access, for eviction)."""
+    global _last_hit_flush
+    with _pending_lock:
+        pending = list(_pending_hits.items())
+        _pending_hits.clear()
+        _last_hit_flush = time.monotonic()
+    if not pending:
+        return 0
+    now = datetime.now().isoformat()
+    with connection() as conn, conn:
+        conn.executemany("UPDATE price_cache SET hits = hits + ?, last_access = ? WHERE key = ?",
+                         [(hits, now, key) for key, hits in pending])
+    return len(pending)
+
+
+atexit.register(flush_hits)
+
+
+def hot_entries(limit, refresh_after_hours=CACHE_EXPIRY_HOURS, max_age_hours=CACHE_EXPIRY_HOURS + CACHE_GRACE_HOURS):
+    """Most frequently accessed keys that are due for a refresh, with their vehicle params.
+
+    Entries older than max_age_hours are past the hard expiry and no longer served, so they are left out.
+    """
+    flush_hits()
+    cutoff = (datetime.now() - timedelta(hours=refresh_after_hours)).isoformat()
+    oldest = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+    with connection() as conn:
+        rows = conn.execute('''SELECT key, make, model, year, size, zip_code FROM price_cache
+                               WHERE timestamp <= ? AND timestamp > ? AND make IS NOT NULL
+                               ORDER BY hits DESC LIMIT ?''', (cutoff, oldest, limit)).fetchall()
+    return [dict(zip(("key", "make", "model", "year", "size", "zip_code"), row)) for row in rows]
+
+
+def decay_hits():
+    """Halve access counts so the hot-key ranking favours recent demand."""
+    with connection() as conn, conn:
+        conn.execute("UPDATE price_cache SET hits = hits / 2 WHERE hits > 0")
+
+
+def fresh_keys(keys, max_age_hours=CACHE_EXPIRY_HOURS):
+    """Subset of keys with a fresh entry, checked in chunks against the primary key and timestamp index."""
+    cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+    keys = list(keys)
+    fresh = set()
+    with connection() as conn:
+        for start in range(0, len(keys), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key FROM price_cache WHERE timestamp > ? AND key IN ({placeholders})",
+                                [cutoff] + chunk).fetchall()
+            fresh.update(row[0] for row in rows)
+    return fresh
+
+
+def put_many(entries):
+    """Upsert many entries in one transaction. entries: (key, prices, make, model, year, size, zip_code)."""
+    global _writes_since_evict
+    now = datetime.now().isoformat()
+    with connection() as conn, conn:
+        conn.executemany('''INSERT INTO price_cache (key, make, model, year, size, zip_code, prices, timestamp, last_access)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE SET prices = excluded.prices, timestamp = excluded.timestamp''',
+                         [(key, make, model, str(year), size, zip_code, json.dumps(prices), now, now)
+                          for key, prices, make, model, year, size, zip_code in entries])
+    _writes_since_evict += len(entries)
+    if _writes_since_evict >= EVICT_EVERY_WRITES:
+        _writes_since_evict = 0
+        evict()
+    return len(entries)
+
+
+def peek_prices(key):
+    """Prices stored for key, or None, without counting an access."""
+    with connection() as conn:
+        row = conn.execute("SELECT prices FROM price_cache WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def entry_timestamp(key):
+    """Timestamp of the entry for key without loading prices or counting an access."""
+    with connection() as conn:
+        row = conn.execute("SELECT timestamp FROM price_cache WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
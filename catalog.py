@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import difflib
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from sites import Listing, brand_from_name
+from log_setup import setup_logging
+
+# Setup logging
+setup_logging()
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tire_catalog.json")
+FUZZY_CUTOFF = 0.85  # difflib ratio needed to accept a misspelt make/model ("Camery"), not a sibling ("Model Y")
+
+MAKE_ALIASES = {"chevy": "chevrolet", "vw": "volkswagen", "mercedesbenz": "mercedes", "benz": "mercedes"}
+
+
+def normalize(text):
+    """'F-150', 'f150' and 'F 150' all become 'f150'."""
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+
+def normalize_size(size):
+    """'19-inch', '19 inch', '19in' and '19"' all become '19'; tyre codes are just compacted."""
+    text = str(size).strip().lower()
+    match = re.fullmatch(r"(\d{2})\s*(?:-?\s*inch(?:es)?|-?in|\")?", text)
+    return match.group(1) if match else normalize(text)
+
+
+@dataclass
+class TireCatalog:
+    """Read-only tyre catalog with every lookup answered from an index built at load time."""
+    by_vehicle: dict = field(default_factory=dict)  # (make, model, year, size) -> [Listing] cheapest first
+    models_by_make: dict = field(default_factory=dict)  # make -> {normalized model: display model}
+    by_size: dict = field(default_factory=dict)  # size -> [Listing], one per tyre, cheapest first
+    cheapest_brand: dict = field(default_factory=dict)  # brand -> cheapest Listing
+    cheapest_brand_by_size: dict = field(default_factory=dict)  # size -> {brand: cheapest Listing}
+
+    def resolve(self, make, model):
+        """Normalized (make, model) index keys, allowing aliases and small typos; None if unknown."""
+        make_key = MAKE_ALIASES.get(normalize(make), normalize(make))
+        if make_key not in self.models_by_make:
+            close = difflib.get_close_matches(make_key, list(self.models_by_make), n=1, cutoff=FUZZY_CUTOFF)
+            if not close:
+                return None
+            make_key = close[0]
+        models = self.models_by_make[make_key]
+        model_key = normalize(model)
+        if model_key not in models:
+            close = difflib.get_close_matches(model_key, list(models), n=1, cutoff=FUZZY_CUTOFF)
+            if not close:
+                return None
+            model_key = close[0]
+        return make_key, model_key
+
+    def lookup(self, make, model, year, size):
+        resolved = self.resolve(make, model)
+        if resolved is None:
+            return []
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            logging.error("Invalid year in catalog lookup")
+            return []
+        return list(self.by_vehicle.get((*resolved, year, normalize_size(size)), []))
+
+    def tyres_for_size(self, size):
+        """Every catalog tyre that comes in this size, across vehicles, cheapest first."""
+        return list(self.by_size.get(normalize_size(size), []))
+
+    def cheapest_by_brand(self, size=None):
+        """brand -> cheapest Listing, optionally restricted to one size."""
+        if size is None:
+            return dict(self.cheapest_brand)
+        return dict(self.cheapest_brand_by_size.get(normalize_size(size), {}))
+
+
+def build_catalog(vehicles):
+    catalog = TireCatalog()
+    by_size_name = {}
+    for vehicle in vehicles:
+        make_key, model_key = normalize(vehicle["make"]), normalize(vehicle["model"])
+        size_key = normalize_size(vehicle["size"])
+        listings = sorted((Listing(name, brand_from_name(name), vehicle["size"], float(price), "catalog")
+                           for name, price in vehicle["tyres"].items()), key=lambda listing: listing.price)
+        catalog.by_vehicle[(make_key, model_key, int(vehicle["year"]), size_key)] = listings
+        catalog.models_by_make.setdefault(make_key, {})[model_key] = vehicle["model"]
+        for listing in listings:
+            current = by_size_name.get((size_key, listing.name))
+            if current is None or listing.price < current.price:
+                by_size_name[(size_key, listing.name)] = listing
+            brand = listing.brand.lower()
+            if brand not in catalog.cheapest_brand or listing.price < catalog.cheapest_brand[brand].price:
+                catalog.cheapest_brand[brand] = listing
+            brands_for_size = catalog.cheapest_brand_by_size.setdefault(size_key, {})
+            if brand not in brands_for_size or listing.price < brands_for_size[brand].price:
+                brands_for_size[brand] = listing
+    for (size_key, name), listing in by_size_name.items():
+        catalog.by_size.setdefault(size_key, []).append(listing)
+    for listings in catalog.by_size.values():
+        listings.sort(key=lambda listing: listing.price)
+    return catalog
+
+
+@lru_cache(maxsize=None)
+def get_catalog(path=CATALOG_FILE):
+    """Load and index the catalog once per process."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return build_catalog(data["vehicles"])
@@ -1,26 +1,312 @@
 import sqlite3
-from datetime import datetime
+import csv
+import re
+import io
+import zlib
+import threading
+import queue
+import atexit
+import logging
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import metrics
+from log_setup import setup_logging
+from sqlite_pool import ConnectionPool
+
+# Setup logging
+setup_logging()
 
 DB_FILE = "appointments.db"
+WRITE_BATCH_MAX = 100  # Bookings committed together in one transaction
+WRITE_BATCH_WINDOW = 0.005  # Seconds the writer waits for more bookings before committing
+WRITE_TIMEOUT = 10
+EXPORT_CHUNK_ROWS = 1000  # Rows fetched from the cursor and encoded per chunk
+EXPORT_COLUMNS = ("id", "contact", "zip_code", "time", "scheduled_at", "created_at")
+RANGE_COLUMNS = {"created_at": "created_at", "scheduled_at": "scheduled_at", "time": "scheduled_at"}
+
+# Booking times are free text ("tomorrow at 10am", "Fri 3pm", "2024-05-01 14:00"); scheduled_at holds the ISO form
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{1,2}):(\d{2}))?")
+US_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b")
+MONTH_DATE_RE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b",
+                           re.I)
+DAY_RE = re.compile(r"\b(today|tomorrow|mon|tue|wed|thu|fri|sat|sun)[a-z]*\b", re.I)
+CLOCK_RE = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b|\b(noon|midday)\b", re.I)
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+_write_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_STOP = object()
+
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, timeout=10, check_same_thread=False)  # Shared through the pool
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this durable across app crashes without a full fsync
+    return conn
+
+
+def _date_part(text, now):
+    match = ISO_DATE_RE.search(text)
+    if match:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3))).date()
+    match = US_DATE_RE.search(text)
+    if match:
+        month, day, year = int(match.group(1)), int(match.group(2)), match.group(3)
+    else:
+        match = MONTH_DATE_RE.search(text)
+        if match:
+            month, day, year = MONTHS.index(match.group(1).lower()[:3]) + 1, int(match.group(2)), None
+    if match:
+        if year:
+            return datetime(int(year) + (2000 if len(year) == 2 else 0), month, day).date()
+        date = datetime(now.year, month, day).date()  # No year: the next such date
+        return date if date >= now.date() else date.replace(year=now.year + 1)
+    match = DAY_RE.search(text)
+    if match:
+        word = match.group(1).lower()
+        if word == "today":
+            return now.date()
+        if word == "tomorrow":
+            return now.date() + timedelta(days=1)
+        return now.date() + timedelta(days=(WEEKDAYS.index(word) - now.weekday()) % 7)
+    return None
+
+
+def _clock_part(text):
+    match = ISO_DATE_RE.search(text)
+    if match and match.group(4):
+        return int(match.group(4)), int(match.group(5))
+    match = CLOCK_RE.search(text)
+    if not match:
+        return None
+    if match.group(6):
+        return 12, 0
+    if match.group(3):
+        return int(match.group(1)) % 12 + (12 if match.group(3).lower() == "pm" else 0), int(match.group(2) or 0)
+    return int(match.group(4)), int(match.group(5))
+
+
+def normalize_time(text, now=None):
+    """ISO form of a free-text booking time, read relative to `now` (when it was booked).
+
+    "YYYY-MM-DDTHH:MM" when a clock time is given (a bare time is its next occurrence), "YYYY-MM-DD" for a day
+    alone, None when nothing in the text reads as a date or time.
+    """
+    if not text:
+        return None
+    now = now or datetime.now()
+    try:
+        date, clock = _date_part(text, now), _clock_part(text)
+        if clock is None:
+            return date.isoformat() if date else None
+        hour, minute = clock
+        if date is None:
+            moment = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            return (moment if moment > now else moment + timedelta(days=1)).isoformat(timespec="minutes")
+        return datetime(date.year, date.month, date.day, hour, minute).isoformat(timespec="minutes")
+    except ValueError:  # "2/30", "25:00" and the like
+        return None
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
+
+def init_db(conn=None):
+    conn = conn or _connect()
     cursor = conn.cursor()
     cursor.execute('''CREATE TABLE IF NOT EXISTS appointments
-                      (id INTEGER PRIMARY KEY, contact TEXT, zip_code TEXT, time TEXT, created_at TEXT)''')
+                      (id INTEGER PRIMARY KEY, contact TEXT, zip_code TEXT, time TEXT, created_at TEXT,
+                       scheduled_at TEXT)''')
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(appointments)")}
+    if "created_at" not in columns:  # Databases created before created_at existed
+        cursor.execute("ALTER TABLE appointments ADD COLUMN created_at TEXT")
+    if "scheduled_at" not in columns:  # Normalize existing bookings once, relative to when they were made
+        cursor.execute("ALTER TABLE appointments ADD COLUMN scheduled_at TEXT")
+        rows = cursor.execute("SELECT id, time, created_at FROM appointments").fetchall()
+        cursor.executemany("UPDATE appointments SET scheduled_at = ? WHERE id = ?",
+                           [(normalize_time(time, datetime.fromisoformat(created_at) if created_at else None), row_id)
+                            for row_id, time, created_at in rows])
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_zip_code ON appointments (zip_code)")
+    cursor.execute("DROP INDEX IF EXISTS idx_appointments_time")  # Free text; time ranges use scheduled_at
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_scheduled_at ON appointments (scheduled_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_created_at ON appointments (created_at)")
     conn.commit()
-    conn.close()
 
-init_db()  # Run on import
+
+_pool = ConnectionPool(_connect, init_db)
+
+
+def connection():
+    """Borrow a pooled connection: `with connection() as conn: ...`. The schema is set up once per process."""
+    return _pool.connection()
+
+
+def _write_loop():
+    with connection() as conn:  # Held by the writer thread for its lifetime
+        _write_batches(conn)
+
+
+def _write_batches(conn):
+    while True:
+        item = _write_queue.get()
+        if item is _STOP:
+            return
+        batch = [item]
+        stop = False
+        while len(batch) < WRITE_BATCH_MAX:
+            try:
+                item = _write_queue.get(timeout=WRITE_BATCH_WINDOW)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        try:
+            with conn:  # One commit for the whole burst
+                ids = [conn.execute('''INSERT INTO appointments (contact, zip_code, time, created_at, scheduled_at)
+                                       VALUES (?, ?, ?, ?, ?)''', row).lastrowid for row, _ in batch]
+        except Exception as e:
+            logging.error(f"Appointment batch of {len(batch)} failed: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), row_id in zip(batch, ids):
+                future.set_result(row_id)
+        if stop:
+            return
+
+
+def _ensure_writer():
+    global _writer
+    with connection():  # Schema problems surface in the caller, not in the writer thread
+        pass
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="appointment-writer", daemon=True)
+            _writer.start()
+
+
+def enqueue_appointment(contact, zip_code, time):
+    """Queue a booking for the group-commit writer; returns a Future resolving to the row id."""
+    _ensure_writer()
+    future = Future()
+    now = datetime.now()
+    _write_queue.put(((contact, zip_code, time, now.isoformat(), normalize_time(time, now)), future))
+    return future
+
 
 def save_appointment(contact, zip_code, time):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    created_at = datetime.now().isoformat()
-    cursor.execute("INSERT INTO appointments (contact, zip_code, time, created_at) VALUES (?, ?, ?, ?)", 
-                   (contact, zip_code, time, created_at))
-    conn.commit()
-    conn.close()
+    """Blocks until the booking is committed (possibly together with concurrent ones)."""
+    with metrics.span("save_appointment"):
+        return enqueue_appointment(contact, zip_code, time).result(WRITE_TIMEOUT)
+
+
+def appointments_by_zip(zip_code, limit=100):
+    """Most recent bookings for a zip code, via the zip_code index."""
+    with connection() as conn:
+        return conn.execute('''SELECT id, contact, zip_code, time, scheduled_at, created_at FROM appointments
+                               WHERE zip_code = ? ORDER BY created_at DESC LIMIT ?''', (zip_code, limit)).fetchall()
+
+
+def _range_column(column):
+    """created_at or scheduled_at ("time" means the latter: the raw time column is free text, not comparable)."""
+    if column not in RANGE_COLUMNS:
+        raise ValueError(f"Unsupported column: {column}")
+    return RANGE_COLUMNS[column]
+
+
+def appointments_between(start, end, column="created_at", limit=1000):
+    """Bookings with start <= column < end (ISO strings), via the created_at or scheduled_at index."""
+    column = _range_column(column)
+    with connection() as conn:
+        return conn.execute(f'''SELECT id, contact, zip_code, time, scheduled_at, created_at FROM appointments
+                                WHERE {column} >= ? AND {column} < ? ORDER BY {column} LIMIT ?''',
+                            (start, end, limit)).fetchall()
+
+
+def _export_filters(start=None, end=None, zip_code=None, column="created_at"):
+    """WHERE clause and params for an export; start <= column < end, all optional."""
+    column = _range_column(column)
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end:
+        clauses.append(f"{column} < ?")
+        params.append(end)
+    if zip_code:
+        clauses.append("zip_code = ?")
+        params.append(zip_code)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def count_appointments(start=None, end=None, zip_code=None, column="created_at"):
+    where, params = _export_filters(start, end, zip_code, column)
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM appointments{where}", params).fetchone()[0]
+
+
+def iter_appointment_csv(start=None, end=None, zip_code=None, column="created_at", compress=False,
+                         chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the filtered appointments as CSV (or gzip) byte chunks, never holding more than one chunk of rows."""
+    where, params = _export_filters(start, end, zip_code, column)
+    # Own connection so a long export doesn't hold a pooled one while the caller consumes the chunks
+    conn = _connect()
+    gzipper = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip header and trailer
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return gzipper.compress(data) if gzipper else data
+
+    try:
+        writer.writerow(EXPORT_COLUMNS)
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM appointments{where} ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            writer.writerows(rows)
+            chunk = flush()
+            if chunk:
+                yield chunk
+        chunk = flush()
+        if gzipper:
+            chunk += gzipper.flush()
+        if chunk:
+            yield chunk
+    finally:
+        conn.close()
+
+
+def export_appointments(path, start=None, end=None, zip_code=None, column="created_at", compress=None):
+    """Stream the filtered appointments to a CSV file (gzipped for *.gz paths); returns the row count."""
+    with connection():  # Make sure the schema exists
+        pass
+    compress = path.endswith(".gz") if compress is None else compress
+    count = count_appointments(start, end, zip_code, column)
+    with open(path, "wb") as f:
+        for chunk in iter_appointment_csv(start, end, zip_code, column, compress):
+            f.write(chunk)
+    logging.info(f"Exported {count} appointments to {path}")
+    return count
+
+
+def shutdown(timeout=5):
+    """Flush queued bookings and stop the writer; registered with atexit."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None and writer.is_alive():
+        _write_queue.put(_STOP)
+        writer.join(timeout)
+
+
+atexit.register(shutdown)
+
 
 def is_after_hours():
     hour = datetime.now().hour
@@ -0,0 +1,115 @@
+import asyncio
+import atexit
+import contextvars
+import threading
+import logging
+from log_setup import setup_logging
+
+# Setup logging
+setup_logging()
+
+POOL_LIMIT = 100  # Total open connections
+POOL_LIMIT_PER_HOST = 8  # Per retailer / API host
+DNS_CACHE_SECONDS = 300
+KEEPALIVE_SECONDS = 30
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_session = None
+
+
+def get_loop():
+    """Start (once) and return the background event loop shared by all sessions."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="http-pool-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+
+async def get_session():
+    """Pooled aiohttp session; must be awaited on the background loop."""
+    global _session
+    if _session is None or _session.closed:
+        import aiohttp  # Only needed once something is actually scraped
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_SECONDS,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def _in_context(coro, context):
+    """Carry the caller's context variables (e.g. the metrics trace ID) over to the loop thread."""
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def submit(coro):
+    """Schedule coro on the background loop from any thread; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), get_loop())
+
+
+def run(coro, timeout=None):
+    """Blocking, thread-safe wrapper used by the synchronous scraper API."""
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except Exception:
+        future.cancel()
+        raise
+
+
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+async def _aclose(agen):
+    await agen.aclose()
+
+
+def iterate(agen, timeout=None):
+    """Drive an async generator on the background loop, yielding its items synchronously."""
+    try:
+        while True:
+            try:
+                item = submit(_anext(agen)).result(timeout)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        submit(_aclose(agen)).result(timeout)
+
+
+async def _close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def shutdown(timeout=5):
+    """Close the pooled session and stop the loop; registered with atexit."""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_session(), loop).result(timeout)
+    except Exception as e:
+        logging.error(f"HTTP pool shutdown error: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    loop.close()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,187 @@
+import os
+import time
+import signal
+import socket
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from log_setup import setup_logging, use_log_file
+from sqlite_pool import ConnectionPool
+
+# Setup logging
+setup_logging()
+
+JOBS_DB_FILE = "scrape_jobs.db"
+JOB_TIMEOUT_SECONDS = 120  # A running job older than this is assumed lost with its worker and re-queued
+MAX_ATTEMPTS = 3
+WORKER_POLL_SECONDS = 0.2  # Idle workers check for new jobs this often
+WAIT_POLL_MIN_SECONDS = 0.05
+WAIT_POLL_MAX_SECONDS = 0.5
+FINISHED_TTL_HOURS = 24  # Finished job rows kept for inspection
+WORKER_LOG_FILE = "scrape-worker-{index}.log"  # One file per worker slot, each rotated by its own process
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+
+def _connect():
+    # Transactions are explicit; connections are shared between threads through the pool
+    conn = sqlite3.connect(JOBS_DB_FILE, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def init_queue(conn):
+    conn.executescript('''CREATE TABLE IF NOT EXISTS scrape_jobs
+                          (key TEXT PRIMARY KEY, make TEXT, model TEXT, year TEXT, size TEXT, zip_code TEXT,
+                           status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT, worker TEXT,
+                           created_at TEXT NOT NULL, started_at TEXT, finished_at TEXT);
+                          CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs (status, created_at);''')
+
+
+_pool = ConnectionPool(_connect, init_queue)
+
+
+def connection():
+    """Borrow a pooled connection: `with connection() as conn: ...`. Each worker process has its own pool."""
+    return _pool.connection()
+
+
+def enqueue(key, make, model, year, size, zip_code):
+    """Queue a scrape for a cache key. A job already queued or running for the key is reused, not duplicated."""
+    now = datetime.now().isoformat()
+    with connection() as conn:
+        conn.execute('''INSERT INTO scrape_jobs (key, make, model, year, size, zip_code, status, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET status = excluded.status, attempts = 0, error = NULL,
+                            worker = NULL, created_at = excluded.created_at, started_at = NULL, finished_at = NULL
+                        WHERE scrape_jobs.status IN (?, ?)''',
+                     (key, make, model, str(year), size, zip_code, QUEUED, now, DONE, FAILED))
+    return key
+
+
+def claim(worker):
+    """Atomically take the oldest queued job (re-queueing ones whose worker died); None if there is nothing to do."""
+    now = datetime.now()
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")  # One writer at a time, so two workers never claim the same job
+        try:
+            conn.execute('''UPDATE scrape_jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                                error = 'worker lost', worker = NULL, finished_at = ?
+                            WHERE status = ? AND started_at < ?''',
+                         (MAX_ATTEMPTS, FAILED, QUEUED, now.isoformat(), RUNNING,
+                          (now - timedelta(seconds=JOB_TIMEOUT_SECONDS)).isoformat()))
+            row = conn.execute('''UPDATE scrape_jobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1
+                                  WHERE key = (SELECT key FROM scrape_jobs WHERE status = ? ORDER BY created_at LIMIT 1)
+                                  RETURNING key, make, model, year, size, zip_code''',
+                               (RUNNING, worker, now.isoformat(), QUEUED)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    if row is None:
+        return None
+    return dict(zip(("key", "make", "model", "year", "size", "zip_code"), row))
+
+
+def finish(key, error=None):
+    with connection() as conn:
+        conn.execute("UPDATE scrape_jobs SET status = ?, error = ?, finished_at = ? WHERE key = ?",
+                     (FAILED if error else DONE, error, datetime.now().isoformat(), key))
+
+
+def job_status(key):
+    with connection() as conn:
+        row = conn.execute("SELECT status, error FROM scrape_jobs WHERE key = ?", (key,)).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def wait(key, timeout):
+    """Poll (with backoff) until the job for key finishes or timeout passes; returns its last status."""
+    deadline = time.monotonic() + timeout
+    delay = WAIT_POLL_MIN_SECONDS
+    while True:
+        status, _ = job_status(key)
+        if status in (DONE, FAILED) or time.monotonic() >= deadline:
+            return status
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, WAIT_POLL_MAX_SECONDS)
+
+
+def purge_finished(max_age_hours=FINISHED_TTL_HOURS):
+    cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+    with connection() as conn:
+        return conn.execute("DELETE FROM scrape_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                            (DONE, FAILED, cutoff)).rowcount
+
+
+def queue_stats():
+    with connection() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM scrape_jobs GROUP BY status").fetchall())
+    return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+
+def worker_loop(handler, worker=None, stop=None, log_file=None):
+    """Claim and run jobs until `stop` is set. `handler(job)` does the scrape and raises on failure."""
+    if log_file:
+        use_log_file(log_file)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    last_purge = 0.0
+    logging.info(f"Scrape worker {worker} started")
+    try:
+        while stop is None or not stop.is_set():
+            job = claim(worker)
+            if job is None:
+                if time.monotonic() - last_purge > 3600:
+                    purge_finished()
+                    last_purge = time.monotonic()
+                time.sleep(WORKER_POLL_SECONDS)
+                continue
+            try:
+                handler(job)
+            except Exception as e:
+                logging.error(f"Scrape job {job['key']} failed: {str(e)}")
+                finish(job["key"], str(e) or type(e).__name__)
+            else:
+                finish(job["key"])
+    except KeyboardInterrupt:
+        pass  # Ctrl+C reaches the whole process group; an interrupted job is re-queued after JOB_TIMEOUT_SECONDS
+    logging.info(f"Scrape worker {worker} stopped")
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_pool(handler, processes=None):
+    """Run `processes` worker processes (default: one per core) until interrupted.
+
+    Workers are spawned, not forked, so each starts with its own logging thread, event loop and connections.
+    `handler` must be importable (a module-level function).
+    """
+    processes = processes or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    workers = [context.Process(target=worker_loop, args=(handler, None, stop, WORKER_LOG_FILE.format(index=i)),
+                               name=f"scrape-worker-{i}")
+               for i in range(processes)]
+    for process in workers:
+        process.start()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _interrupt)  # docker stop / systemd: let workers finish their current job
+    try:
+        while any(process.is_alive() for process in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for process in workers:
+            process.join(JOB_TIMEOUT_SECONDS)
+    return processes
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = "app.log"  # Written and rotated only by the Streamlit app; other processes call use_log_file()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
+TAIL_BLOCK_BYTES = 64 * 1024
+TAIL_MAX_BYTES = 1024 * 1024  # Upper bound on what one tail reads, however rare the requested level is
+
+# Lines written before the switch to JSON: "2024-01-01 10:00:00,123 - INFO - msg" (app.py) or "INFO:root:msg"
+LEGACY_RE = re.compile(r"^(?:(?P<ts>\d{4}-\d\d-\d\d [\d:,.]+) - (?P<level>[A-Z]+) - |(?P<level2>[A-Z]+):(?P<logger>[^:]*):)")
+
+_listener = None
+_log_queue = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, so the tail can filter on level without guessing at the format."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _file_handler(filename):
+    # delay: the file is only opened by the first record, so a process that switches files early never holds it
+    handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8",
+                                  delay=True)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def setup_logging(filename=LOG_FILE, level=logging.DEBUG):
+    """Route the root logger through a queue to a background thread that writes rotating JSON lines.
+
+    Idempotent: every module calls it at import and Streamlit reruns app.py in the same process.
+    """
+    global _listener, _log_queue
+    with _setup_lock:
+        if _listener is not None:
+            return
+        _log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.addHandler(QueueHandler(_log_queue))  # Callers only pay for an enqueue
+        root.setLevel(level)
+        _listener = QueueListener(_log_queue, _file_handler(filename), respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def use_log_file(filename):
+    """Send this process's records to its own file from now on.
+
+    A rotating file must have a single writer: with several processes appending to app.log, each rotates on
+    its own and records are lost (on Windows the rename fails outright). So only the app writes app.log, and
+    the scraper CLI and each worker process log to a file named after their role.
+    """
+    global _listener
+    setup_logging()
+    with _setup_lock:
+        old = _listener
+        old.stop()  # Drains records queued so far into the old file
+        for handler in old.handlers:
+            handler.close()
+        _listener = QueueListener(_log_queue, _file_handler(filename), respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging():
+    """Drain the queue and close the file; registered with atexit."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def parse_line(line):
+    """Record dict for a JSON line or an old plain-text line; None for blank lines."""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except ValueError:
+            pass
+    match = LEGACY_RE.match(line)
+    if match:
+        return {"ts": match.group("ts"), "level": match.group("level") or match.group("level2"),
+                "logger": match.group("logger"), "msg": line[match.end():]}
+    return {"ts": None, "level": None, "logger": None, "msg": line}  # e.g. a traceback continuation line
+
+
+def _lines_from_end(f, max_bytes):
+    """Yield the file's lines last to first, reading fixed-size blocks backwards from the end."""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    stop = max(0, position - max_bytes)
+    remainder = b""
+    while position > stop:
+        size = min(TAIL_BLOCK_BYTES, position - stop)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b"\n")
+        remainder = lines.pop(0)  # Possibly cut mid-line; completed by the next block
+        for line in reversed(lines):
+            yield line
+    if stop == 0 and remainder:
+        yield remainder
+
+
+def tail_records(filename=LOG_FILE, limit=50, min_level="DEBUG", max_bytes=TAIL_MAX_BYTES):
+    """Last `limit` records at or above min_level, oldest first, without reading the whole file."""
+    threshold = logging.getLevelName(min_level) if isinstance(min_level, str) else min_level
+    records = []
+    try:
+        with open(filename, "rb") as f:
+            for raw in _lines_from_end(f, max_bytes):
+                record = parse_line(raw.decode("utf-8", errors="replace"))
+                if record is None:
+                    continue
+                level = logging.getLevelName(record["level"]) if record["level"] else None
+                if threshold > logging.DEBUG and not isinstance(level, int):
+                    continue  # Unknown level lines only show up unfiltered
+                if isinstance(level, int) and level < threshold:
+                    continue
+                records.append(record)
+                if len(records) >= limit:
+                    break
+    except FileNotFoundError:
+        return []
+    records.reverse()
+    return records
+
+
+def format_record(record):
+    parts = [record.get("ts"), record.get("level"), record.get("msg")]
+    text = " ".join(part for part in parts if part)
+    return text + ("\n" + record["exc"] if record.get("exc") else "")
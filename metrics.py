@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from log_setup import setup_logging
+
+# Setup logging
+setup_logging()
+
+METRIC_PREFIX = "cartyre"
+SAMPLE_WINDOW = 1024  # Recent samples kept per histogram for percentiles
+RECENT_SPANS = 500  # Finished spans kept for the trace view
+QUANTILES = (0.5, 0.95, 0.99)
+EXPORT_INTERVAL_SECONDS = 15
+
+trace_id = contextvars.ContextVar("trace_id", default=None)
+
+
+class Histogram:
+    """Count and sum over all time, percentiles over the last SAMPLE_WINDOW observations."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.samples.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self.samples)
+            count, total = self.count, self.total
+        quantiles = {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None for q in QUANTILES}
+        return count, total, quantiles
+
+
+_histograms = {}  # (name, labels) -> Histogram
+_counters = {}  # (name, labels) -> int
+_spans = deque(maxlen=RECENT_SPANS)
+_registry_lock = threading.Lock()
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    with _registry_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+    histogram.observe(seconds)
+
+
+def incr(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _registry_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def current_trace():
+    return trace_id.get()
+
+
+@contextmanager
+def trace(new_id=None):
+    """Tie every span recorded in this context (and in tasks it starts) to one trace ID."""
+    token = trace_id.set(new_id or uuid.uuid4().hex[:16])
+    try:
+        yield trace_id.get()
+    finally:
+        trace_id.reset(token)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into the `name` histogram; failures and cancellations are also counted."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, **labels)
+        if status != "ok":
+            incr(f"{name}_{status}", **labels)
+        record = {"trace": trace_id.get(), "name": name, "labels": dict(labels), "ms": round(elapsed * 1000, 2),
+                  "status": status, "end": time.time()}
+        _spans.append(record)
+        logging.debug(f"span {name} {record['ms']}ms {status} trace={record['trace']} {labels or ''}")
+
+
+def timed(name, **labels):
+    """Decorator form of span() for plain and async functions."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Per-stage latency (p50/p95/p99 in ms) and counters, for the admin panel."""
+    with _registry_lock:
+        histograms = list(_histograms.items())
+        counters = dict(_counters)
+    stages = []
+    for (name, labels), histogram in sorted(histograms):
+        count, total, quantiles = histogram.snapshot()
+        stages.append({
+            "stage": name + "".join(f" {k}={v}" for k, v in labels),
+            "count": count,
+            "mean_ms": round(total / count * 1000, 1) if count else None,
+            **{f"p{int(q * 100)}_ms": round(value * 1000, 1) if value is not None else None
+               for q, value in quantiles.items()},
+        })
+    counts = {name + "".join(f" {k}={v}" for k, v in labels): value for (name, labels), value in sorted(counters.items())}
+    return {"stages": stages, "counters": counts}
+
+
+def recent_traces(limit=10):
+    """Spans of the most recent traces, newest trace first, each trace's spans in finishing order."""
+    traces = {}
+    for record in reversed(list(_spans)):
+        if record["trace"] is None:
+            continue
+        if record["trace"] not in traces:
+            if len(traces) >= limit:
+                continue
+            traces[record["trace"]] = []
+        traces[record["trace"]].append(record)
+    return {tid: list(reversed(spans)) for tid, spans in traces.items()}
+
+
+def _metric_name(name):
+    return f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """Prometheus text exposition: a summary per stage and a counter per event."""
+    with _registry_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    lines = []
+    seen = set()
+    for (name, labels), histogram in histograms:
+        metric = _metric_name(name) + "_seconds"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} summary")
+        count, total, quantiles = histogram.snapshot()
+        for q, value in quantiles.items():
+            if value is not None:
+                lines.append(f"{metric}{_label_text(labels, [('quantile', q)])} {value:.6f}")
+        lines.append(f"{metric}_sum{_label_text(labels)} {total:.6f}")
+        lines.append(f"{metric}_count{_label_text(labels)} {count}")
+    for (name, labels), value in counters:
+        metric = _metric_name(name) + "_total"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically write the exposition to a file, e.g. for node_exporter's textfile collector."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(port=None, path=None, interval=EXPORT_INTERVAL_SECONDS):
+    """Serve /metrics on `port` and/or rewrite `path` every `interval` seconds (METRICS_PORT / METRICS_FILE).
+
+    Started once per process; later calls are no-ops.
+    """
+    global _exporter_started
+    port = port or os.getenv("METRICS_PORT")
+    path = path or os.getenv("METRICS_FILE")
+    with _exporter_lock:
+        if _exporter_started or not (port or path):
+            return
+        _exporter_started = True
+    if port:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood app.log
+
+        server = ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"Serving metrics on :{port}/metrics")
+    if path:
+        def write_loop():
+            while True:
+                try:
+                    write_prometheus(path)
+                except OSError as e:
+                    logging.error(f"Metrics file write failed: {str(e)}")
+                time.sleep(interval)
+
+        threading.Thread(target=write_loop, name="metrics-file", daemon=True).start()
+        logging.info(f"Writing metrics to {path} every {interval}s")
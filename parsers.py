@@ -0,0 +1,101 @@
+import asyncio
+import importlib.util
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from sites import Listing, brand_from_name
+from log_setup import setup_logging
+
+# Setup logging
+setup_logging()
+
+RESULT_LIMIT = 5  # Default when a caller does not pass an adapter limit
+PARSE_WORKERS = 2
+PARSE_POOL = os.getenv('PARSE_POOL', 'thread')  # "process" sidesteps the GIL for very large pages
+
+# Faster C parser backend when installed; checked without importing it
+PARSER_BACKEND = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if PARSE_POOL == 'process':
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="html-parse")
+    return _executor
+
+
+async def run_parser(html, adapter):
+    """Parse in the parse pool so the event loop keeps serving other sites."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), parse_listings, html, adapter)
+
+
+def _container_strainer(tag_name, css_class, limit):
+    """Only build trees for the first `limit` matching containers; everything else is skipped."""
+    seen = [0]
+
+    def match(name, attrs):
+        if name != tag_name or seen[0] >= limit:
+            return False
+        classes = attrs.get('class', '') if attrs else ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        if css_class not in classes:
+            return False
+        seen[0] += 1
+        return True
+
+    from bs4 import SoupStrainer
+    return SoupStrainer(match)
+
+
+def _truncate_after(html, tag_name, css_class, limit):
+    """Cut the page at the start of container number limit + 1 so the parser never reads the rest."""
+    pattern = re.compile(r'<%s\b[^>]*\bclass\s*=\s*["\'][^"\']*(?<![\w-])%s(?![\w-])' % (tag_name, re.escape(css_class)), re.I)
+    for count, found in enumerate(pattern.finditer(html), start=1):
+        if count > limit:
+            return html[:found.start()]
+    return html
+
+
+def select_containers(html, tag_name, css_class, limit=RESULT_LIMIT):
+    from bs4 import BeautifulSoup  # Imported on first parse, not when the app starts
+    html = _truncate_after(html, tag_name, css_class, limit)
+    soup = BeautifulSoup(html, PARSER_BACKEND, parse_only=_container_strainer(tag_name, css_class, limit))
+    return soup.find_all(tag_name, class_=css_class, limit=limit)
+
+
+def _find(container, selector):
+    return container.find(selector[0], class_=selector[1]) if selector else None
+
+
+def _text(elem, default="N/A"):
+    return elem.text.strip() if elem else default
+
+
+def _to_price(text):
+    try:
+        return float(text.replace('$', '').replace(',', ''))
+    except ValueError:
+        return 0.0
+
+
+def parse_listings(html, adapter, limit=None):
+    """Extract up to adapter.limit Listings using the adapter's declared selectors."""
+    limit = limit or adapter.limit
+    listings = []
+    tag_name, css_class = adapter.container
+    for product in select_containers(html, tag_name, css_class, limit):
+        name = _text(_find(product, adapter.name_selector), "Unknown")
+        price = _to_price(_text(_find(product, adapter.price_selector)))
+        if price <= 0:
+            continue
+        brand_elem = _find(product, adapter.brand_selector)
+        brand = brand_elem.text.strip() if brand_elem else brand_from_name(name)
+        listings.append(Listing(name, brand, _text(_find(product, adapter.size_selector)), price, adapter.name))
+    return listings
@@ -0,0 +1,176 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_RATE = 1.0  # Requests per second per host
+DEFAULT_BURST = 2
+
+# Per-host overrides: (requests per second, burst)
+HOST_LIMITS = {
+    "www.tirerack.com": (1.0, 2),
+    "simpletire.com": (1.0, 2),
+    "www.discounttire.com": (1.0, 2),
+    "api.wheel-size.com": (2.0, 4),
+}
+
+
+class RateLimited(Exception):
+    """The next token for a host is further away than the caller can wait; no token was taken."""
+
+
+def _take(tokens, rate, max_wait):
+    """(tokens left, delay until the taken token is due); (tokens, None) if that is more than max_wait away."""
+    delay = max(0.0, (1 - tokens) / rate)
+    if max_wait is not None and delay > max_wait:
+        return tokens, None
+    return tokens - 1, delay
+
+
+class TokenBucket:
+    """Async token bucket; callers wait only as long as needed for the next token."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _reserve(self, max_wait=None):
+        """Take a token now, or reserve the next one and return how long to wait for it.
+
+        Returns None, without reserving, when the wait would exceed max_wait.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens, delay = _take(self.tokens, self.rate, max_wait)
+            return delay
+
+    def _release(self):
+        """Give back a reserved token whose request was never sent."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    async def _reserve_async(self, max_wait):
+        return self._reserve(max_wait)
+
+    def _release_soon(self):
+        self._release()
+
+    async def acquire(self, max_wait=None):
+        delay = await self._reserve_async(max_wait)
+        if delay is None:
+            raise RateLimited(f"next token in more than {max_wait:.2f}s")
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release_soon()  # Cancelled callers (e.g. at the scrape deadline) must not starve later ones
+                raise
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in a SQLite table, so every process using the same database draws from one limit.
+
+    Each reserve/release is one short write transaction, run in a thread because it can wait on other processes'
+    locks; the wait for the token itself still happens in the caller's loop.
+    """
+
+    def __init__(self, host, db_file, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        super().__init__(rate, burst)
+        self.host = host
+        self.db_file = db_file
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)  # Transactions are explicit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (host TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                         "updated REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, change):
+        """Apply change(tokens) -> (tokens, result) to the host's row atomically; returns result."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()  # Wall clock: monotonic clocks are not comparable across processes
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE host = ?", (self.host,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens, result = change(tokens)
+            conn.execute("INSERT OR REPLACE INTO rate_limits (host, tokens, updated) VALUES (?, ?, ?)",
+                         (self.host, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _reserve(self, max_wait=None):
+        return self._update(lambda tokens: _take(tokens, self.rate, max_wait))
+
+    def _release(self):
+        self._update(lambda tokens: (min(self.burst, tokens + 1), None))
+
+    async def _reserve_async(self, max_wait):
+        future = asyncio.get_running_loop().run_in_executor(None, self._reserve, max_wait)
+        try:
+            return await asyncio.shield(future)  # Cancelling the caller must not lose a token reserved meanwhile
+        except asyncio.CancelledError:
+            future.add_done_callback(self._release_reserved)
+            raise
+
+    def _release_reserved(self, future):
+        if future.exception() is None and future.result() is not None:
+            self._release_soon()
+
+    def _release_soon(self):
+        asyncio.get_running_loop().run_in_executor(None, self._release)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_shared_db = None
+
+
+def share_limits(db_file):
+    """Keep the buckets in db_file from now on, so all processes that call this share one limit per host."""
+    global _shared_db
+    with _buckets_lock:
+        if _shared_db != db_file:
+            _shared_db = db_file
+            _buckets.clear()
+
+
+def get_bucket(host):
+    with _buckets_lock:
+        if host not in _buckets:
+            rate, burst = HOST_LIMITS.get(host, (DEFAULT_RATE, DEFAULT_BURST))
+            _buckets[host] = SharedTokenBucket(host, _shared_db, rate, burst) if _shared_db else TokenBucket(rate, burst)
+        return _buckets[host]
+
+
+def host_key(url):
+    """Bucket key for a URL: its host, plus the port when one is given (e.g. local stubs, one per site)."""
+    parts = urlsplit(url)
+    host = parts.hostname or url
+    return f"{host}:{parts.port}" if parts.port else host
+
+
+async def acquire(url, max_wait=None):
+    """Wait for a token for the host of url; shared by every session in the process (and across processes after
+    share_limits()).
+
+    Raises RateLimited instead of waiting longer than max_wait seconds.
+    """
+    await get_bucket(host_key(url)).acquire(max_wait)
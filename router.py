@@ -0,0 +1,293 @@
+import re
+import threading
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from agent import (quote_tire_prices, book_appointment, get_agent_executor, make_stream_handler, tool_calls,
+                   simple_price_response, SIDE_EFFECT_TOOLS)
+from memory_cache import TTLCache
+import cache_store
+import catalog
+import metrics
+from log_setup import setup_logging
+
+# Setup logging
+setup_logging()
+
+DEFAULT_ZIP = "90210"
+ANSWER_CACHE_SIZE = 1024
+ANSWER_TTL_SECONDS = 3600  # For answers not tied to a cached price entry
+PRICE_TOOL_ARGS = ("make", "model", "year", "size", "zip_code")  # fetch_tire_prices arguments, in make_key order
+
+# Makes recognised in free-form text ("Toyota Camry 2023, 19-inch tyres, zip 90210")
+KNOWN_MAKES = {
+    "toyota": "Toyota", "honda": "Honda", "ford": "Ford", "bmw": "BMW", "tesla": "Tesla",
+    "chevrolet": "Chevrolet", "chevy": "Chevrolet", "mercedes": "Mercedes", "mercedes-benz": "Mercedes",
+    "volkswagen": "Volkswagen", "vw": "Volkswagen", "audi": "Audi", "nissan": "Nissan", "hyundai": "Hyundai",
+    "kia": "Kia", "subaru": "Subaru", "mazda": "Mazda", "jeep": "Jeep", "lexus": "Lexus", "ram": "Ram",
+    "gmc": "GMC", "dodge": "Dodge", "volvo": "Volvo", "porsche": "Porsche",
+}
+
+LABELED_RE = re.compile(
+    r"\b(make|model|year|size|zip(?:[\s_-]?code)?|contact|phone|email|time)\s*[:=]\s*([^,;\n]+)", re.I)
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"(?<!\d)(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)")
+TIME_RE = re.compile(
+    r"\b(?:(?:today|tomorrow|mon|tue|wed|thu|fri|sat|sun)[a-z]*\s+)?(?:at\s+)?\d{1,2}(?::\d{2})?\s*(?:am|pm)\b", re.I)
+SIZE_RE = re.compile(r"\b(\d{2})\s*(?:-?\s*inch(?:es)?\b|\"|-?in\b)|\b\d{3}/\d{2}\s*Z?R\s*\d{2}\b", re.I)
+YEAR_RE = re.compile(r"\b(19[89]\d|20[0-4]\d)\b")
+ZIP_RE = re.compile(r"\b(\d{5})\b")
+BOOKING_RE = re.compile(r"\b(book|booking|appointment|schedule|install(?:ation)?|reserve)\b", re.I)
+# A booking is only written without the LLM for an explicit command ("Book me in ...", "Schedule ...")
+BOOKING_VERB_RE = re.compile(r"\b(book|schedule|reserve)\b", re.I)
+# ... that isn't a question, a negation or a change to an existing booking
+BOOKING_VETO_RE = re.compile(r"\?|\b(cancel\w*|reschedul\w*|change|move|postpone|delete|remove|not|don'?t|do not|"
+                             r"can'?t|cannot|won'?t|never|free|available|availability)\b", re.I)
+# Dropped from the residual question terms so rephrasings share a cache key
+QUESTION_STOP_WORDS = {"a", "an", "the", "for", "my", "me", "i", "is", "are", "what", "how", "much", "please",
+                       "tyre", "tyres", "tire", "tires", "of", "on", "to", "do", "you", "can", "in", "with", "and",
+                       "r", "u", "any", "some", "need", "want", "would", "like", "get", "zip", "size", "year"}
+# Question terms that still mean "just quote me prices"
+PRICE_WORDS = {"price", "prices", "pricing", "cost", "costs", "quote", "quotes", "cheap", "cheapest", "lowest",
+               "show", "find", "check", "give", "new", "set", "four", "4", "hi", "hello", "thanks"}
+MODEL_STOP_WORDS = {"tyre", "tyres", "tire", "tires", "zip", "for", "with", "in", "at", "size", "year", "and", "please"}
+
+
+@dataclass
+class ParsedRequest:
+    intent: str = None  # "price", "booking" or None for free-form questions
+    make: str = None
+    model: str = None
+    year: str = None
+    size: str = None
+    zip_code: str = None
+    contact: str = None
+    time: str = None
+    terms: tuple = ()  # Normalized leftover words of a free-form question
+
+    def vehicle(self):
+        return (self.make, self.model, self.year, self.size or "unknown", self.zip_code or DEFAULT_ZIP)
+
+
+def normalize_size(text):
+    match = SIZE_RE.search(text)
+    if not match:
+        return None
+    return f"{match.group(1)}-inch" if match.group(1) else match.group(0).upper().replace(" ", "")
+
+
+CUT = "\x00"  # Fills spans already parsed (year, size, zip...); a model never runs across one
+
+
+def _cut(text, match):
+    """Blank out a matched span so later patterns don't re-read it."""
+    return text[:match.start()] + CUT * (match.end() - match.start()) + text[match.end():]
+
+
+def _model_from_words(make, words):
+    """The longest leading run of words the catalog knows as a model of make; for models it doesn't know,
+    the first word plus any following ones with digits ("Model 3")."""
+    for end in range(len(words), 0, -1):
+        if catalog.get_catalog().resolve(make, " ".join(words[:end])):
+            return " ".join(words[:end])
+    model_words = words[:1]
+    for word in words[1:]:
+        if not re.search(r"\d", word):
+            break
+        model_words.append(word)
+    return " ".join(model_words) or None
+
+
+def _find_make_model(text):
+    words = re.findall(r"[\w-]+|[,;.]|\x00+", text)
+    for i, word in enumerate(words):
+        make = KNOWN_MAKES.get(word.lower())
+        if not make:
+            continue
+        model_words = []
+        for word_after in words[i + 1:i + 4]:
+            if word_after in ",;." or word_after.startswith(CUT) or word_after.lower() in MODEL_STOP_WORDS:
+                break
+            model_words.append(word_after)
+        return make, _model_from_words(make, model_words)
+    return None, None
+
+
+def parse_request(text):
+    """Deterministically extract vehicle, zip, contact, time and intent from a chat message."""
+    parsed = ParsedRequest()
+    rest = text
+    for match in LABELED_RE.finditer(text):
+        label, value = match.group(1).lower(), match.group(2).strip()
+        if label == "make":
+            parsed.make = KNOWN_MAKES.get(value.lower(), value.title())
+        elif label == "model":
+            parsed.model = value
+        elif label == "year" and YEAR_RE.search(value):
+            parsed.year = YEAR_RE.search(value).group(1)
+        elif label == "size":
+            parsed.size = normalize_size(value) or value
+        elif label.startswith("zip") and ZIP_RE.search(value):
+            parsed.zip_code = ZIP_RE.search(value).group(1)
+        elif label in ("contact", "phone", "email"):
+            parsed.contact = value
+        elif label == "time":
+            parsed.time = value
+        rest = _cut(rest, match)
+
+    for pattern, field in ((EMAIL_RE, "contact"), (PHONE_RE, "contact"), (TIME_RE, "time")):
+        match = pattern.search(rest)
+        if match and not getattr(parsed, field):
+            setattr(parsed, field, match.group(0).strip())
+            rest = _cut(rest, match)
+    match = SIZE_RE.search(rest)
+    if match:
+        parsed.size = parsed.size or normalize_size(match.group(0))
+        rest = _cut(rest, match)
+    match = YEAR_RE.search(rest)
+    if match:
+        parsed.year = parsed.year or match.group(1)
+        rest = _cut(rest, match)
+    match = ZIP_RE.search(rest)
+    if match:
+        parsed.zip_code = parsed.zip_code or match.group(1)
+        rest = _cut(rest, match)
+    if not parsed.make:
+        parsed.make, model = _find_make_model(rest)
+        parsed.model = parsed.model or model
+    vehicle_words = set(re.findall(r"[a-z0-9]+", f"{parsed.make or ''} {parsed.model or ''}".lower()))
+    parsed.terms = tuple(sorted({w for w in re.findall(r"[a-z0-9]+", rest.lower())
+                                 if w not in QUESTION_STOP_WORDS and w not in vehicle_words}))
+
+    if BOOKING_RE.search(text) or (parsed.contact and parsed.time):
+        parsed.intent = "booking"
+    elif parsed.make and parsed.model and parsed.year:
+        parsed.intent = "price"
+    return parsed
+
+
+answer_cache = TTLCache(max_size=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_TTL_SECONDS)
+
+
+def answer_key(parsed):
+    """Normalized request key (vehicle tuple + intent + question terms); None for vehicle-less chatter."""
+    if not parsed.make:
+        return None
+    return (parsed.intent, parsed.make.lower(), (parsed.model or "").lower(), parsed.year, parsed.size,
+            parsed.zip_code, parsed.terms)
+
+
+def _price_key(parsed):
+    return cache_store.make_key(*parsed.vehicle()) if parsed.make and parsed.model and parsed.year else None
+
+
+def cached_answer(text):
+    """Previously generated LLM answer for an equivalent request, if its prices haven't changed since."""
+    parsed = parse_request(text)
+    key = answer_key(parsed)
+    if key is None or parsed.intent == "booking":
+        return None
+    item = answer_cache.get(key)
+    if item is None:
+        return None
+    answer, prices = item
+    if any(cache_store.entry_timestamp(price_key) != timestamp for price_key, timestamp in prices):
+        answer_cache.invalidate(key)  # Prices were refreshed; the answer may quote old ones
+        return None
+    return answer
+
+
+def _answer_price_keys(parsed, calls):
+    """Price-cache keys an answer was based on: those the agent's fetch_tire_prices calls used, else the
+    key the message itself parses to."""
+    keys = [cache_store.make_key(*(str(args[name]) for name in PRICE_TOOL_ARGS))
+            for tool, args in calls if tool == "fetch_tire_prices" and all(name in args for name in PRICE_TOOL_ARGS)]
+    if keys:
+        return keys
+    price_key = _price_key(parsed)
+    return [price_key] if price_key else []
+
+
+def remember_answer(text, answer, calls=()):
+    """Cache an LLM answer; it expires together with the price-cache entries it was based on.
+
+    `calls` are the agent run's (tool, arguments) pairs (see agent.tool_calls). Booking requests and runs that
+    called a tool with side effects are never cached: replaying them would skip the booking for the next customer.
+    """
+    parsed = parse_request(text)
+    key = answer_key(parsed)
+    if key is None or parsed.intent == "booking" or SIDE_EFFECT_TOOLS.intersection(tool for tool, _ in calls):
+        return
+    prices = [(price_key, cache_store.entry_timestamp(price_key)) for price_key in _answer_price_keys(parsed, calls)]
+    prices = [(price_key, timestamp) for price_key, timestamp in prices if timestamp is not None]
+    ttl = ANSWER_TTL_SECONDS
+    if prices:
+        expires = min(datetime.fromisoformat(timestamp) for _, timestamp in prices) + timedelta(
+            hours=cache_store.CACHE_EXPIRY_HOURS)
+        ttl = (expires - datetime.now()).total_seconds()
+        if ttl <= 0:
+            return
+    answer_cache.put(key, (answer, prices), ttl_seconds=ttl)
+
+
+_stats = {"fast": 0, "llm": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(path):
+    with _stats_lock:
+        _stats[path] += 1
+
+
+def is_booking_command(text):
+    """True only for an explicit, unqualified request to book; anything else about bookings goes to the LLM."""
+    return bool(BOOKING_VERB_RE.search(text)) and not BOOKING_VETO_RE.search(text)
+
+
+def route(text):
+    """Answer directly when the message parses; returns None when it should go to the LLM agent."""
+    parsed = parse_request(text)
+    response = None
+    if (parsed.intent == "booking" and parsed.contact and parsed.time and parsed.zip_code
+            and is_booking_command(text)):
+        response = book_appointment(parsed.contact, parsed.zip_code, parsed.time)
+    elif parsed.intent == "price" and set(parsed.terms) <= PRICE_WORDS:
+        # Other question words ("quietest", "snow") need the LLM
+        response = quote_tire_prices(*parsed.vehicle())
+    _count("fast" if response is not None else "llm")
+    if response is not None:
+        logging.info(f"Fast path ({parsed.intent}): {text}")
+    return response
+
+
+def router_stats():
+    with _stats_lock:
+        total = _stats["fast"] + _stats["llm"]
+        stats = {**_stats, "fast_ratio": round(_stats["fast"] / total, 3) if total else 0.0}
+    answers = answer_cache.stats()
+    stats["answer_cache_hits"] = answers["hits"]
+    stats["answer_cache_size"] = answers["size"]
+    return stats
+
+
+def handle_message(text, load_executor=get_agent_executor, write=None, fallback=simple_price_response):
+    """The chat message path shared by app.py and the load test.
+
+    Fast path first, then the answer cache, then the agent (its final answer streamed to `write` as it is
+    generated); `fallback(text)` answers when the agent fails.
+    """
+    response = route(text) or cached_answer(text)
+    if response is not None:
+        return response
+    try:
+        agent_executor = load_executor()
+        callbacks = [make_stream_handler(write)] if write else []
+        with metrics.span("agent_invoke"):
+            result = agent_executor.invoke({"input": text}, {"callbacks": callbacks})
+        response = result["output"]
+        remember_answer(text, response, tool_calls(result))
+        logging.info(f"✅ Agent success: {text}")
+    except Exception as e:
+        response = fallback(text)
+        logging.warning(f"Agent failed, using fallback: {str(e)}")
+    return response
@@ -1,21 +1,55 @@
-import requests
-from bs4 import BeautifulSoup
-import json
 import os
 import time
 import asyncio
-import aiohttp
-from datetime import datetime, timedelta
 import logging
 import random
+import argparse
+import csv
+import json
+import threading
+from datetime import datetime, timedelta
+import cache_store
+import site_health
+import http_pool
+import rate_limit
+import parsers
+import sites
+import catalog
+import metrics
+import jobs
+from sites import Listing
+from memory_cache import TTLCache, SingleFlight
+from log_setup import setup_logging, use_log_file
 
 # Setup logging
-logging.basicConfig(filename='app.log', level=logging.DEBUG)
+setup_logging()
+
+CACHE_EXPIRY_HOURS = cache_store.CACHE_EXPIRY_HOURS
+CACHE_GRACE_HOURS = cache_store.CACHE_GRACE_HOURS
+REFRESH_AHEAD_HOURS = 2  # The scheduler refreshes hot keys this long before they expire
+REFRESH_CONCURRENCY = 4
+HOT_KEYS_PER_PASS = 50
+WARM_CONCURRENCY = 8
+WARM_BATCH_SIZE = 50  # Cache rows written per transaction during bulk warm-up
+LRU_MAX_ENTRIES = 512
+LRU_TTL_SECONDS = 300  # Short TTL so the in-process copy never outlives the persistent entry by much
+
+price_lru = TTLCache(max_size=LRU_MAX_ENTRIES, ttl_seconds=LRU_TTL_SECONDS)
+price_flight = SingleFlight()
+_refreshing = set()  # Keys with a background refresh in flight
+_refreshing_lock = threading.Lock()
+
+SCRAPER_LOG_FILE = "scraper-{command}.log"  # The CLI never writes app.log, which the app rotates
+
+SCRAPE_DEADLINE_SECONDS = 4  # Latency budget for a whole multi-site scrape
 
-CACHE_FILE = "price_cache.json"
-CACHE_EXPIRY_HOURS = 24
+# Queue mode: live scrapes run in `python scraper.py workers` processes instead of the UI process
+QUEUE_MODE = os.getenv('SCRAPE_QUEUE', '').lower() in ('1', 'true', 'yes')
+QUEUE_WAIT_SECONDS = float(os.getenv('SCRAPE_QUEUE_WAIT', SCRAPE_DEADLINE_SECONDS + 2))
+if QUEUE_MODE:
+    rate_limit.share_limits(jobs.JOBS_DB_FILE)  # Anything this process still fetches counts against the workers' limits
 
-WHEEL_SIZE_API_BASE = "https://api.wheel-size.com/v2"
+WHEEL_SIZE_API_BASE = os.getenv('WHEEL_SIZE_API_BASE', "https://api.wheel-size.com/v2")
 WHEEL_SIZE_API_KEY = os.getenv('WHEEL_SIZE_API_KEY', '')  # Free sandbox key from https://developer.wheel-size.com/
 
 # User agents for rotation
@@ -28,67 +62,14 @@ USER_AGENTS = [
 # Optional proxies (uncomment and add free proxies from https://free-proxy-list.net/)
 # PROXIES = ["http://proxy1:port", "http://proxy2:port"]
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_cache(cache):
-    with open(CACHE_FILE, "w") as f:
-        json.dump(cache, f)
-
-def is_cache_valid(key, cache):
-    if key in cache and 'timestamp' in cache[key]:
-        ts = datetime.fromisoformat(cache[key]['timestamp'])
-        if datetime.now() - ts < timedelta(hours=CACHE_EXPIRY_HOURS):
-            return True
-    return False
+def is_cache_valid(key):
+    return cache_store.is_fresh(key, CACHE_EXPIRY_HOURS)
 
 def get_mock_prices(make, model, year, size):
-    # Extra Feature: Expanded mock data with more models
-    mock_data = {
-        "Toyota": {
-            "Camry": {2023: {"19-inch": {"Michelin Defender": 189.99, "Bridgestone Turanza": 199.99, "Goodyear Assurance": 179.99}}},
-            "RAV4": {2023: {"18-inch": {"Goodyear Assurance": 159.99, "Continental TrueContact": 169.99, "Pirelli Scorpion": 174.99}}},
-            "Corolla": {2022: {"17-inch": {"Michelin Energy": 149.99, "Firestone Firehawk": 139.99}}},
-        },
-        "Honda": {
-            "Accord": {2022: {"18-inch": {"Michelin Pilot": 179.99, "Firestone Firehawk": 169.99, "Bridgestone Potenza": 184.99}}},
-            "Civic": {2023: {"17-inch": {"Continental ExtremeContact": 159.99, "Goodyear Eagle": 149.99}}},
-        },
-        "Ford": {
-            "F-150": {2024: {"20-inch": {"BFGoodrich All-Terrain": 229.99, "Goodyear Wrangler": 219.99, "Michelin LTX": 239.99}}},
-            "Mustang": {2023: {"19-inch": {"Pirelli P Zero": 249.99, "Continental SportContact": 239.99}}},
-        },
-        "BMW": {
-            "X5": {2021: {"19-inch": {"Pirelli Scorpion": 249.99, "Continental ExtremeContact": 239.99, "Michelin Latitude": 259.99}}},
-            "3 Series": {2023: {"18-inch": {"Bridgestone Turanza": 219.99, "Goodyear Eagle": 209.99}}},
-        },
-        "Tesla": {
-            "Model 3": {2023: {"18-inch": {"Michelin Pilot Sport": 229.99, "Continental ProContact": 219.99}}},
-            "Model Y": {2024: {"19-inch": {"Pirelli Elect": 239.99, "Goodyear ElectricDrive": 229.99}}},
-        },
-        "Chevrolet": {
-            "Silverado": {2023: {"20-inch": {"Goodyear Wrangler": 249.99, "BFGoodrich KO2": 259.99}}},
-        },
-        "Mercedes": {
-            "GLE": {2022: {"19-inch": {"Continental CrossContact": 269.99, "Pirelli Scorpion Verde": 259.99}}},
-        },
-        "Volkswagen": {  # New
-            "Golf": {2023: {"18-inch": {"Michelin Pilot": 189.99, "Continental Sport": 179.99}}},
-        },
-        "Audi": {  # New
-            "A4": {2022: {"19-inch": {"Pirelli P Zero": 229.99, "Bridgestone Potenza": 219.99}}},
-        }
-    }
-
-    try:
-        return mock_data.get(make.title(), {}).get(model.title(), {}).get(int(year), {}).get(size, {})
-    except ValueError:
-        logging.error("Invalid year in mock prices")
-        return {}
+    """name -> price from the indexed catalog (normalized and fuzzy make/model matching)."""
+    return {listing.name: listing.price for listing in catalog.get_catalog().lookup(make, model, year, size)}
 
+@metrics.timed("wheel_size_api")
 def get_recommended_tire_sizes(make, model, year):
     if not WHEEL_SIZE_API_KEY:
         logging.warning("Wheel-Size API key not set")
@@ -102,6 +83,8 @@ def get_recommended_tire_sizes(make, model, year):
             "region": "usdm",
             "user_key": WHEEL_SIZE_API_KEY
         }
+        import requests
+        http_pool.run(rate_limit.acquire(url))
         response = requests.get(url, params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
@@ -116,149 +99,441 @@ def get_recommended_tire_sizes(make, model, year):
         logging.error(f"Wheel-Size API error: {str(e)}")
         return "API error. Using mock: 19-inch."
 
-async def async_scrape_tirerack(session, url):
-    """Detailed scraping for Tire Rack with additional fields."""
-    prices = {}
+async def async_scrape_site(session, adapter, url):
+    """Fetch one retailer's results page and parse it with its adapter. Network/HTTP errors propagate to the breaker."""
+    headers = {"User-Agent": random.choice(USER_AGENTS)}
+    with metrics.span("site_scrape", site=adapter.name):
+        # Optional proxy: async with session.get(url, headers=headers, proxy=random.choice(PROXIES), timeout=...) as response:
+        async with session.get(url, headers=headers, timeout=adapter.timeout) as response:
+            response.raise_for_status()
+            text = await response.text()
+        with metrics.span("parse", site=adapter.name):
+            listings = await parsers.run_parser(text, adapter)
+    logging.info(f"{adapter.name} scraped successfully: {len(listings)} items")
+    return listings
+
+async def _guarded_scrape(session, adapter, url, max_wait=None):
+    """Scrape one site behind its rate limit and circuit breaker, recording latency and failures.
+
+    Only requests actually sent count towards the site's health: waiting on (or being refused by) the local
+    rate limiter never opens the breaker.
+    """
+    site = adapter.name
+    breaker = site_health.get_breaker(site)
     try:
-        headers = {"User-Agent": random.choice(USER_AGENTS)}
-        # Optional proxy: async with session.get(url, headers=headers, proxy=random.choice(PROXIES), timeout=10) as response:
-        async with session.get(url, headers=headers, timeout=10) as response:
-            if response.status == 200:
-                text = await response.text()
-                soup = BeautifulSoup(text, 'html.parser')
-                products = soup.find_all('div', class_='product-result')  # Main container
-                for product in products[:5]:  # Limit for speed
-                    # Name and brand
-                    name_elem = product.find('span', class_='product-name')
-                    name = name_elem.text.strip() if name_elem else "Unknown"
-                    brand = name.split()[0] if name != "Unknown" else "Unknown"  # Extract brand from name
-                    
-                    # Price
-                    price_elem = product.find('span', class_='price-amount')
-                    price_text = price_elem.text.strip().replace('$', '').replace(',', '') if price_elem else "N/A"
-                    try:
-                        price = float(price_text)
-                    except ValueError:
-                        price = 0.0
-                    
-                    # Additional details: Size, rating, warranty
-                    size_elem = product.find('div', class_='tire-size')  # Assumed class; adjust if needed
-                    size = size_elem.text.strip() if size_elem else "N/A"
-                    
-                    rating_elem = product.find('span', class_='rating-value')  # Assumed for customer rating
-                    rating = rating_elem.text.strip() if rating_elem else "N/A"
-                    
-                    warranty_elem = product.find('div', class_='warranty-info')  # Assumed
-                    warranty = warranty_elem.text.strip() if warranty_elem else "N/A"
-                    
-                    if price > 0:
-                        prices[name] = {
-                            "price": price,
-                            "brand": brand,
-                            "size": size,
-                            "rating": rating,
-                            "warranty": warranty
-                        }
-                logging.info(f"Tire Rack scraped successfully: {len(prices)} items")
+        with metrics.span("rate_limit_wait", site=site):
+            await rate_limit.acquire(url, max_wait)  # Politeness is per host and process-wide, only for real requests
+    except rate_limit.RateLimited as e:
+        logging.info(f"{site} skipped: {str(e)}")
+        site_health.get_stats(site).record_skip()
+        breaker.release()
+        return site, []
+    except asyncio.CancelledError:
+        site_health.get_stats(site).record_skip()  # Deadline passed while still queued locally
+        breaker.release()
+        raise
     except Exception as e:
-        logging.error(f"Tire Rack scrape failed: {str(e)}")
-        # Fallback: Search for any price-like strings
-        price_tags = soup.find_all(string=lambda t: t and '$' in t)
-        for tag in price_tags[:5]:
-            prices[f"Fallback {len(prices)+1}"] = tag.strip()
-    return prices
-
-async def async_scrape_site(session, url, site_name):
-    prices = {}
+        # The limiter itself failed (e.g. the shared limits database is locked); the site was never contacted
+        logging.error(f"{site} skipped: rate limiter failed: {str(e)}")
+        site_health.get_stats(site).record_skip()
+        breaker.release()
+        return site, []
+    start = time.monotonic()
     try:
-        async with session.get(url, timeout=10) as response:
-            if response.status == 200:
-                text = await response.text()
-                soup = BeautifulSoup(text, 'html.parser')
-                if site_name == "simpletire":
-                    items = soup.find_all('div', class_='product-item')
-                    for item in items[:5]:
-                        name_elem = item.find('h3', class_='product-name')
-                        price_elem = item.find('span', class_='price')
-                        if name_elem and price_elem:
-                            name = name_elem.text.strip()
-                            try:
-                                price = float(price_elem.text.strip().replace('$', '').replace(',', ''))
-                                prices[name] = price
-                            except ValueError:
-                                continue
-                elif site_name == "discounttire":
-                    items = soup.find_all('div', class_='product-item')  
-                    for item in items[:5]:
-                        name_elem = item.find('h3', class_='product-name')
-                        price_elem = item.find('span', class_='price')
-                        if name_elem and price_elem:
-                            name = name_elem.text.strip()
-                            try:
-                                price = float(price_elem.text.strip().replace('$', '').replace(',', ''))
-                                prices[name] = price
-                            except ValueError:
-                                continue
+        listings = await async_scrape_site(session, adapter, url)
+    except asyncio.CancelledError:
+        # Missed the latency budget; repeated misses open the breaker like any other failure
+        site_health.get_stats(site).record(time.monotonic() - start, "deadline exceeded")
+        breaker.record_failure()
+        raise
     except Exception as e:
-        logging.error(f"{site_name} scrape failed: {str(e)}")
-    return prices
-
-async def async_scrape_prices(make, model, year, size, zip_code):
-    headers = {"User-Agent": random.choice(USER_AGENTS)}  # Rotation
-    async with aiohttp.ClientSession(headers=headers) as session:
-        query = f"{year} {make} {model} {size} tires"
-        tirerack_url = f"https://www.tirerack.com/tires/TireSearchResults.jsp?searchText={query.replace(' ', '+')}&zip-code={zip_code}"
-        simpletire_url = f"https://simpletire.com/search?query={query.replace(' ', '%20')}"
-        discounttire_url = f"https://www.discounttire.com/search/tires?q={query.replace(' ', '+')}&zip={zip_code}"
-
-        tasks = [
-            async_scrape_tirerack(session, tirerack_url),  # Dedicated detailed scraper
-            async_scrape_site(session, simpletire_url, "simpletire"),
-            async_scrape_site(session, discounttire_url, "discounttire")
-        ]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        all_prices = {}
-        for res in results:
-            if not isinstance(res, Exception):
-                all_prices.update(res)
-        return all_prices
+        logging.error(f"{site} scrape failed: {str(e)}")
+        site_health.get_stats(site).record(time.monotonic() - start, str(e) or type(e).__name__)
+        breaker.record_failure()
+        return site, []
+    site_health.get_stats(site).record(time.monotonic() - start)
+    breaker.record_success()
+    return site, listings
 
-def scrape_tire_prices(make, model, year, size, zip_code='90210'):
-    cache = load_cache()
-    key = f"{make}-{model}-{year}-{size}-{zip_code}"
+async def async_iter_prices(make, model, year, size, zip_code, deadline=SCRAPE_DEADLINE_SECONDS):
+    """Yield (site, listings) as each site answers; sites still running at the deadline (None: no deadline) are cancelled."""
+    # Shared keep-alive pool; User-Agent rotation is per request
+    session = await http_pool.get_session()
+    tasks = []
+    for adapter in sites.SITES.values():
+        if not site_health.get_breaker(adapter.name).allow():
+            site_health.get_stats(adapter.name).record_skip()
+            logging.info(f"{adapter.name} skipped: circuit open")
+            continue
+        url = adapter.build_url(make, model, year, size, zip_code)
+        tasks.append(asyncio.ensure_future(_guarded_scrape(session, adapter, url, deadline)))
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            try:
+                yield await next_done
+            except asyncio.TimeoutError:
+                logging.warning(f"Scrape deadline of {deadline}s reached")
+                break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def async_scrape_prices(make, model, year, size, zip_code, deadline=SCRAPE_DEADLINE_SECONDS):
+    """Merge whatever sites answered within the latency budget."""
+    all_listings = []
+    async for site, listings in async_iter_prices(make, model, year, size, zip_code, deadline):
+        all_listings.extend(listings)
+    return all_listings
+
+def get_mock_listings(make, model, year, size):
+    return catalog.get_catalog().lookup(make, model, year, size)
+
+def _store(key, listings, make, model, year, size, zip_code):
+    with metrics.span("cache_write"):
+        cache_store.put_entry(key, [listing.to_dict() for listing in listings], make, model, year, size, zip_code)
+    price_lru.put(key, listings)
+
+def _persistent_listings(key, make, model, year, size, zip_code):
+    """Stale-while-revalidate: expired entries inside the grace window are served and refreshed in the background."""
+    with metrics.span("cache_read"):
+        entry = cache_store.get_entry(key, max_age_hours=CACHE_EXPIRY_HOURS + CACHE_GRACE_HOURS)
+    if entry is None:
+        return None
+    listings = sites.to_listings(entry['prices'])
+    price_lru.put(key, listings)
+    if datetime.now() - datetime.fromisoformat(entry['timestamp']) >= timedelta(hours=CACHE_EXPIRY_HOURS):
+        schedule_refresh(make, model, year, size, zip_code)
+    return listings
+
+async def async_refresh_entry(make, model, year, size, zip_code):
+    """Re-fetch one key from its source chain; a failed refresh keeps the stale entry.
+
+    Runs in the background, so there is no UI deadline: each site gets its own request timeout. A scrape that
+    reached fewer sites than the stale entry holds doesn't replace it.
+    """
+    key = cache_store.make_key(make, model, year, size, zip_code)
+    loop = asyncio.get_running_loop()
+    listings = get_mock_listings(make, model, year, size)
+    if not listings:
+        listings = await async_scrape_prices(make, model, year, size, zip_code, deadline=None)
+        stale = await loop.run_in_executor(None, cache_store.peek_prices, key) or []
+        stale_sites = {listing.site for listing in sites.to_listings(stale)}
+        if listings and len({listing.site for listing in listings}) < len(stale_sites):
+            logging.warning(f"Refresh of {key} reached fewer sites than the cached entry; keeping it")
+            return False
+    if listings:
+        await loop.run_in_executor(None, _store, key, listings, make, model, year, size, zip_code)
+    return bool(listings)
+
+def schedule_refresh(make, model, year, size, zip_code):
+    """Refresh a key on the background loop unless a refresh for it is already running.
+
+    In queue mode the refresh becomes a job for the workers instead; nothing is scraped in this process.
+    """
+    key = cache_store.make_key(make, model, year, size, zip_code)
+    if QUEUE_MODE:
+        jobs.enqueue(key, make, model, year, size, zip_code)
+        return None
+    with _refreshing_lock:
+        if key in _refreshing:
+            return None
+        _refreshing.add(key)
+    
+    def done(future):
+        with _refreshing_lock:
+            _refreshing.discard(key)
+        if not future.cancelled() and future.exception():
+            logging.error(f"Background refresh of {key} failed: {str(future.exception())}")
+    
+    future = http_pool.submit(async_refresh_entry(make, model, year, size, zip_code))
+    future.add_done_callback(done)
+    return future
+
+async def async_refresh_many(entries, concurrency=REFRESH_CONCURRENCY):
+    """Refresh vehicle entries with at most `concurrency` running at once (capped like warm-up, see
+    warm_concurrency); returns how many succeeded."""
+    semaphore = asyncio.Semaphore(warm_concurrency(concurrency))
+    
+    async def refresh_one(entry):
+        async with semaphore:
+            try:
+                return await async_refresh_entry(entry['make'], entry['model'], entry['year'], entry['size'], entry['zip_code'])
+            except Exception as e:
+                logging.error(f"Refresh of {entry['key']} failed: {str(e)}")
+                return False
+    
+    results = await asyncio.gather(*(refresh_one(entry) for entry in entries))
+    return sum(results)
+
+def refresh_hot_keys(top=HOT_KEYS_PER_PASS, concurrency=REFRESH_CONCURRENCY):
+    """One scheduler pass: refresh the most accessed keys that are close to expiry."""
+    entries = cache_store.hot_entries(top, refresh_after_hours=CACHE_EXPIRY_HOURS - REFRESH_AHEAD_HOURS)
+    refreshed = http_pool.run(async_refresh_many(entries, concurrency)) if entries else 0
+    cache_store.decay_hits()
+    logging.info(f"Refreshed {refreshed}/{len(entries)} hot cache keys")
+    return len(entries), refreshed
+
+def iter_tire_prices(make, model, year, size, zip_code='90210', deadline=SCRAPE_DEADLINE_SECONDS):
+    """Synchronous progressive variant for the UI: yields (source, listings) per site, then caches the merge."""
+    key = cache_store.make_key(make, model, year, size, zip_code)
+    listings = price_lru.get(key)
+    if listings is not None:
+        cache_store.record_hit(key)
+    listings = (listings or _persistent_listings(key, make, model, year, size, zip_code)
+                or get_mock_listings(make, model, year, size))
+    if listings:
+        yield "cache", listings
+        return
+    
+    if QUEUE_MODE:
+        listings = _queued_listings(key, make, model, year, size, zip_code)
+        if listings:
+            price_lru.put(key, listings)
+            yield "queue", listings
+        return
+    
+    all_listings = []
+    for site, site_listings in http_pool.iterate(async_iter_prices(make, model, year, size, zip_code, deadline)):
+        all_listings.extend(site_listings)
+        yield site, site_listings
+    if all_listings:
+        _store(key, all_listings, make, model, year, size, zip_code)
+
+def _queued_listings(key, make, model, year, size, zip_code):
+    """Hand the scrape to the worker pool and wait for its result to land in the shared cache."""
+    jobs.enqueue(key, make, model, year, size, zip_code)
+    with metrics.span("queue_wait"):
+        status = jobs.wait(key, QUEUE_WAIT_SECONDS)
+    if status != jobs.DONE:
+        logging.warning(f"Scrape job {key} is {status} after {QUEUE_WAIT_SECONDS}s")
+        return None
+    entry = cache_store.get_entry(key)
+    return sites.to_listings(entry['prices']) if entry else None
+
+def run_job(job):
+    """Worker side of a queued scrape: scrape live and write the result to the shared cache."""
+    rate_limit.share_limits(jobs.JOBS_DB_FILE)  # Every worker process draws from the same per-host buckets
+    params = (job['make'], job['model'], job['year'], job['size'], job['zip_code'])
+    listings = get_mock_listings(*params[:4]) or http_pool.run(async_scrape_prices(*params))
+    if not listings:
+        raise RuntimeError("no listings from any site")
+    _store(job['key'], listings, *params)
+
+def _load_tire_prices(key, make, model, year, size, zip_code):
+    """Persistent cache (fresh or stale), then mock data, then a live scrape (or a queued one in queue mode)."""
+    listings = _persistent_listings(key, make, model, year, size, zip_code)
+    if listings is not None:
+        metrics.incr("price_lookups", source="persistent")
+        return listings
     
-    if is_cache_valid(key, cache):
-        return cache[key]['prices']
+    listings = get_mock_listings(make, model, year, size)
+    source = "catalog"
     
-    prices = get_mock_prices(make, model, year, size)
+    if not listings and QUEUE_MODE:
+        listings = _queued_listings(key, make, model, year, size, zip_code)
+        if listings:
+            metrics.incr("price_lookups", source="queue")
+            price_lru.put(key, listings)
+            return listings
+        # Not cached, so the worker's result is served as soon as it lands
+        metrics.incr("price_lookups", source="fallback")
+        return [Listing("Fallback Tire", "Fallback", size or "N/A", 199.99, "fallback")]
     
-    if not prices:
+    if not listings:
+        source = "scrape"
         try:
-            prices = asyncio.run(async_scrape_prices(make, model, year, size, zip_code))
+            listings = http_pool.run(async_scrape_prices(make, model, year, size, zip_code))
         except Exception as e:
             logging.error(f"Async scrape error: {str(e)}")
-            prices = {}
+            listings = []
         
-        if not prices:
-            prices = {"Fallback Tire": 199.99}
+        if not listings:
+            # Not cached, so the next lookup tries the sites again instead of serving this for a day
+            metrics.incr("price_lookups", source="fallback")
+            return [Listing("Fallback Tire", "Fallback", size or "N/A", 199.99, "fallback")]
     
-    recommendation = ""
-    if not size or size.lower() == 'unknown':
-        recommendation = get_recommended_tire_sizes(make, model, year) + "\n"
+    metrics.incr("price_lookups", source=source)
     
-    cache[key] = {
-        'prices': prices,
-        'timestamp': datetime.now().isoformat()
-    }
-    save_cache(cache)
+    _store(key, listings, make, model, year, size, zip_code)
+    return listings
+
+def scrape_tire_prices(make, model, year, size, zip_code='90210'):
+    """Return a list of Listing records for the vehicle, from the fastest source that has them."""
+    key = cache_store.make_key(make, model, year, size, zip_code)
     
-    time.sleep(1)  # Polite delay
-    return prices if not recommendation else recommendation + str(prices)
+    with metrics.span("scrape_tire_prices"):
+        listings = price_lru.get(key)
+        if listings is not None:
+            metrics.incr("price_lookups", source="memory")
+            cache_store.record_hit(key)  # Keeps the hottest keys at the top of the refresh ranking
+            return listings
+        
+        # Concurrent sessions asking for the same key share one load/scrape
+        return price_flight.do(key, _load_tire_prices, key, make, model, year, size, zip_code)
 
-# Manual update
-if __name__ == "__main__":
+def cache_stats():
+    """LRU hit/miss counters plus coalesced single-flight calls, for sizing the LRU."""
+    stats = price_lru.stats()
+    stats["coalesced"] = price_flight.coalesced
+    stats["in_flight"] = price_flight.in_flight()
+    return stats
+
+def site_stats():
+    """Per-site latency, failure rate and circuit breaker state."""
+    return site_health.site_report()
+
+def load_vehicles(path):
+    """Read vehicles from a CSV (header row) or JSONL file with make, model, year, size and zip/zip_code."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    vehicles = []
+    for row in rows:
+        row = {k.strip().lower(): str(v).strip() for k, v in row.items() if k}
+        vehicles.append({
+            "make": row.get("make", ""),
+            "model": row.get("model", ""),
+            "year": row.get("year", ""),
+            "size": row.get("size", "unknown"),
+            "zip_code": row.get("zip_code") or row.get("zip") or "90210",
+        })
+    return vehicles
+
+def warm_concurrency(requested=WARM_CONCURRENCY):
+    """Vehicles scraped at once. Each vehicle sends one request per retailer, so this is also the number of
+    requests in flight per host; it is capped at the smallest retailer burst so no host is asked for more than
+    its rate limit allows at a time."""
+    bursts = [rate_limit.get_bucket(rate_limit.host_key(adapter.url_template)).burst for adapter in sites.SITES.values()]
+    return max(1, min([requested, *bursts]))
+
+async def async_scrape_many(vehicles, concurrency=WARM_CONCURRENCY, batch_size=WARM_BATCH_SIZE):
+    """Scrape vehicles with bounded concurrency, writing results to the cache in batched transactions.
+
+    There is no overall deadline as in the UI: every site gets its own request timeout (adapter.timeout), and
+    requests queue on the per-host rate limits instead of being cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(warm_concurrency(concurrency))
+    pending = []
+    counts = {"scraped": 0, "empty": 0, "failed": 0}
+    
+    async def flush():
+        batch = pending[:]
+        pending.clear()
+        if batch:
+            rows = [(key, [listing.to_dict() for listing in listings], *params) for key, listings, params in batch]
+            await loop.run_in_executor(None, cache_store.put_many, rows)
+            for key, listings, params in batch:
+                price_lru.put(key, listings)
+    
+    async def scrape_one(vehicle):
+        params = (vehicle['make'], vehicle['model'], vehicle['year'], vehicle['size'], vehicle['zip_code'])
+        async with semaphore:
+            try:
+                listings = get_mock_listings(*params[:4]) or await async_scrape_prices(*params, deadline=None)
+            except Exception as e:
+                logging.error(f"Warm-up of {params} failed: {str(e)}")
+                counts["failed"] += 1
+                return
+        if not listings:
+            counts["empty"] += 1
+            return
+        counts["scraped"] += 1
+        pending.append((cache_store.make_key(*params), listings, params))
+        if len(pending) >= batch_size:
+            await flush()
+    
+    await asyncio.gather(*(scrape_one(vehicle) for vehicle in vehicles))
+    await flush()
+    return counts
+
+def scrape_many(vehicles, concurrency=WARM_CONCURRENCY, batch_size=WARM_BATCH_SIZE, force=False):
+    """Bulk cache warm-up. Skips keys that are already fresh unless force; returns a throughput report."""
+    start = time.monotonic()
+    by_key = {}
+    for vehicle in vehicles:
+        key = cache_store.make_key(vehicle['make'], vehicle['model'], vehicle['year'], vehicle['size'], vehicle['zip_code'])
+        by_key.setdefault(key, vehicle)
+    fresh = set() if force else cache_store.fresh_keys(by_key)
+    todo = [vehicle for key, vehicle in by_key.items() if key not in fresh]
+    
+    sites_before = site_health.site_report()
+    counts = http_pool.run(async_scrape_many(todo, concurrency, batch_size)) if todo else {"scraped": 0, "empty": 0, "failed": 0}
+    elapsed = time.monotonic() - start
+    
+    site_errors = {}
+    for site, after in site_health.site_report().items():
+        before = sites_before.get(site, {})
+        requests_made = after["requests"] - before.get("requests", 0)
+        failures = after["failures"] - before.get("failures", 0)
+        site_errors[site] = {
+            "requests": requests_made,
+            "failures": failures,
+            "skipped": after["skipped"] - before.get("skipped", 0),
+            "error_rate": round(failures / requests_made, 3) if requests_made else 0.0,
+        }
+    return {
+        "vehicles": len(vehicles),
+        "unique_keys": len(by_key),
+        "skipped_fresh": len(fresh),
+        **counts,
+        "seconds": round(elapsed, 2),
+        "keys_per_second": round(len(todo) / elapsed, 2) if elapsed > 0 else 0.0,
+        "sites": site_errors,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the tyre price cache.")
+    commands = parser.add_subparsers(dest="command")
+    refresh = commands.add_parser("refresh", help="Refresh the most requested keys before they expire")
+    refresh.add_argument("--top", type=int, default=HOT_KEYS_PER_PASS, help="Keys refreshed per pass")
+    refresh.add_argument("--concurrency", type=int, default=REFRESH_CONCURRENCY, help="Refreshes running at once (capped by the retailers' rate-limit burst)")
+    refresh.add_argument("--interval", type=float, default=0, help="Seconds between passes; 0 runs a single pass")
+    warm = commands.add_parser("warm", help="Pre-warm the cache for a fleet of vehicles from CSV or JSONL")
+    warm.add_argument("path", help="CSV with a header row, or .jsonl; fields: make, model, year, size, zip")
+    warm.add_argument("--concurrency", type=int, default=WARM_CONCURRENCY,
+                      help="Vehicles scraped at once (capped by the retailers' rate-limit burst)")
+    warm.add_argument("--batch-size", type=int, default=WARM_BATCH_SIZE, help="Cache rows per write transaction")
+    warm.add_argument("--force", action="store_true", help="Re-scrape keys that are still fresh")
+    workers = commands.add_parser("workers", help="Run scrape worker processes for queue mode (SCRAPE_QUEUE=1)")
+    workers.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+    use_log_file(SCRAPER_LOG_FILE.format(command=args.command or "update"))
+    
+    if args.command == "workers":
+        print(f"👷 Starting {args.processes} scrape workers (Ctrl+C to stop)")
+        jobs.run_pool(run_job, args.processes)
+        return
+    
+    if args.command == "warm":
+        report = scrape_many(load_vehicles(args.path), args.concurrency, args.batch_size, args.force)
+        if warm_concurrency(args.concurrency) < args.concurrency:
+            print(f"⏳ Concurrency capped at {warm_concurrency(args.concurrency)} by the per-host rate limits")
+        print(f"🔥 Warmed {report['scraped']} keys ({report['skipped_fresh']} already fresh, "
+              f"{report['empty']} empty, {report['failed']} failed) in {report['seconds']}s "
+              f"= {report['keys_per_second']} keys/s")
+        for site, stats in report["sites"].items():
+            print(f"   {site}: {stats['requests']} requests, {stats['failures']} failures "
+                  f"({stats['error_rate']:.1%}), {stats['skipped']} skipped by breaker")
+        return
+    
+    if args.command == "refresh":
+        while True:
+            due, refreshed = refresh_hot_keys(args.top, args.concurrency)
+            print(f"🔄 Refreshed {refreshed}/{due} hot keys")
+            if args.interval <= 0:
+                break
+            time.sleep(args.interval)
+        return
+    
+    # Manual update
     print("🛠️ Updating price cache...")
     scrape_tire_prices("Toyota", "Camry", "2023", "19-inch", "90210")
     scrape_tire_prices("Honda", "Accord", "2022", "18-inch", "10001")
-    print("✅ Cache updated!")
\ No newline at end of file
+    print("✅ Cache updated!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+
+FAILURE_THRESHOLD = 3  # Consecutive failures before a site is skipped
+RESET_TIMEOUT_SECONDS = 60  # How long a site stays open before a half-open probe
+LATENCY_WINDOW = 200  # Samples kept per site for percentiles
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Per-site breaker: closed -> open after repeated failures -> half-open single probe -> closed."""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True  # Only one request probes the site
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """The allowed call never reached the site; let another caller probe it."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class SiteStats:
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_error = ""
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency, error=None):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if error is not None:
+                self.failures += 1
+                self.last_error = error
+
+    def record_skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "failure_rate": round(self.failures / self.requests, 3) if self.requests else 0.0,
+                "p50_ms": _percentile_ms(ordered, 0.50),
+                "p95_ms": _percentile_ms(ordered, 0.95),
+                "last_error": self.last_error,
+            }
+
+
+def _percentile_ms(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+_breakers = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(site):
+    with _registry_lock:
+        if site not in _breakers:
+            _breakers[site] = CircuitBreaker(site)
+        return _breakers[site]
+
+
+def get_stats(site):
+    with _registry_lock:
+        if site not in _stats:
+            _stats[site] = SiteStats(site)
+        return _stats[site]
+
+
+def site_report():
+    """Latency/failure stats and breaker state for every site seen so far."""
+    with _registry_lock:
+        sites = sorted(set(_breakers) | set(_stats))
+    report = {}
+    for site in sites:
+        report[site] = get_stats(site).snapshot()
+        report[site]["breaker"] = get_breaker(site).state
+    return report
@@ -0,0 +1,98 @@
+from dataclasses import dataclass, asdict
+from urllib.parse import quote
+
+
+@dataclass(slots=True)
+class Listing:
+    """One tyre offer from any source (retailer, mock catalog, fallback)."""
+    name: str
+    brand: str
+    size: str
+    price: float
+    site: str
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data.get('brand') or brand_from_name(data['name']), data.get('size') or "N/A",
+                   float(data['price']), data.get('site') or "unknown")
+
+
+@dataclass(frozen=True)
+class SiteAdapter:
+    """Declarative retailer config. Selectors are (tag, css class); None means not on the page."""
+    name: str
+    url_template: str  # Formatted with query and zip_code
+    container: tuple
+    name_selector: tuple
+    price_selector: tuple
+    size_selector: tuple = None
+    brand_selector: tuple = None  # Default: first word of the product name
+    space: str = "+"  # How the site encodes spaces in the search query
+    limit: int = 5
+    timeout: float = 10
+
+    def build_url(self, make, model, year, size, zip_code):
+        query = quote(f"{year} {make} {model} {size} tires", safe="").replace("%20", self.space)
+        return self.url_template.format(query=query, zip_code=quote(str(zip_code), safe=""))
+
+
+def brand_from_name(name):
+    return name.split()[0] if name and name != "Unknown" else "Unknown"
+
+
+SITES = {}
+
+
+def register_site(adapter):
+    SITES[adapter.name] = adapter
+    return adapter
+
+
+# Adding a retailer is one entry here (adjust selectors if sites change)
+register_site(SiteAdapter(
+    name="tirerack",
+    url_template="https://www.tirerack.com/tires/TireSearchResults.jsp?searchText={query}&zip-code={zip_code}",
+    container=("div", "product-result"),
+    name_selector=("span", "product-name"),
+    price_selector=("span", "price-amount"),
+    size_selector=("div", "tire-size"),
+))
+register_site(SiteAdapter(
+    name="simpletire",
+    url_template="https://simpletire.com/search?query={query}",
+    container=("div", "product-item"),
+    name_selector=("h3", "product-name"),
+    price_selector=("span", "price"),
+    size_selector=("p", "product-size"),
+    space="%20",
+))
+register_site(SiteAdapter(
+    name="discounttire",
+    url_template="https://www.discounttire.com/search/tires?q={query}&zip={zip_code}",
+    container=("div", "product-item"),
+    name_selector=("h3", "product-name"),
+    price_selector=("span", "price"),
+    size_selector=("p", "product-size"),
+))
+
+
+def to_listings(raw, site="cache", size="N/A"):
+    """Normalize cached data, including legacy name -> price / name -> detail dicts, to Listings."""
+    if isinstance(raw, dict):
+        listings = []
+        for name, value in raw.items():
+            if isinstance(value, dict):
+                value = value.get('price', 0.0)
+            try:
+                listings.append(Listing(name, brand_from_name(name), size, float(value), site))
+            except (TypeError, ValueError):
+                continue  # Old Tire Rack fallback entries were raw "$..." strings
+        return listings
+    return [item if isinstance(item, Listing) else Listing.from_dict(item) for item in raw or []]
+
+
+def cheapest(listings):
+    return min(listings, key=lambda listing: listing.price) if listings else None
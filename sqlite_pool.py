@@ -0,0 +1,49 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+POOL_SIZE = 4  # Idle connections kept per database; extra ones opened under load are closed on return
+
+
+class ConnectionPool:
+    """A few SQLite connections shared by every thread of the process.
+
+    Streamlit runs each rerun on a fresh script thread, so per-thread connections were opened (and their pragmas
+    run) on every rerun and only closed by the garbage collector. Connections are opened with
+    check_same_thread=False by `connect` and only ever used by one thread at a time, while checked out.
+    """
+
+    def __init__(self, connect, init=None, size=POOL_SIZE):
+        self._connect = connect
+        self._init = init
+        self.size = size
+        self._idle = queue.LifoQueue()  # Most recently used first, so a quiet app keeps reusing one connection
+        self._init_lock = threading.Lock()
+        self._initialized = init is None
+
+    def _open(self):
+        conn = self._connect()
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:  # Schema set up once per process
+                    self._init(conn)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:  # Never hand the next borrower someone else's open transaction
+                conn.rollback()
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
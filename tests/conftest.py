@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The app modules use relative paths for app.log and their SQLite files; keep the tests out of the working copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="cartyre-tests-"))
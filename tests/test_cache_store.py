@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+import cache_store
+
+
+def _put(key, age_hours):
+    cache_store.put_entry(key, [], "Toyota", key, "2023", "19", "90210")
+    timestamp = (datetime.now() - timedelta(hours=age_hours)).isoformat()
+    with cache_store.connection() as conn, conn:
+        conn.execute("UPDATE price_cache SET timestamp = ? WHERE key = ?", (timestamp, key))
+
+
+def test_lru_hits_rank_keys_for_refresh():
+    _put("hot-lru", 23)
+    _put("warm-persistent", 23)
+    cache_store.get_entry("warm-persistent")
+    for _ in range(5):
+        cache_store.record_hit("hot-lru")
+    keys = [entry["key"] for entry in cache_store.hot_entries(10, refresh_after_hours=22)]
+    assert keys.index("hot-lru") < keys.index("warm-persistent")
+
+
+def test_entries_past_hard_expiry_are_not_refreshed():
+    _put("expired", cache_store.CACHE_EXPIRY_HOURS + cache_store.CACHE_GRACE_HOURS + 1)
+    _put("stale", cache_store.CACHE_EXPIRY_HOURS + 1)
+    keys = {entry["key"] for entry in cache_store.hot_entries(10)}
+    assert "stale" in keys
+    assert "expired" not in keys
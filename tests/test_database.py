@@ -0,0 +1,41 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import database
+
+BOOKED = datetime(2026, 10, 17, 9, 30)  # A Saturday morning
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tomorrow at 10am", "2026-10-18T10:00"),
+    ("Fri 3pm", "2026-10-23T15:00"),
+    ("2026-11-02 14:00", "2026-11-02T14:00"),
+    ("Dec 3rd 2:30 pm", "2026-12-03T14:30"),
+    ("8am", "2026-10-18T08:00"),  # Already past today
+    ("12/24", "2026-12-24"),
+    ("whenever suits", None),
+])
+def test_normalize_time(text, expected):
+    assert database.normalize_time(text, BOOKED) == expected
+
+
+def test_time_ranges_use_normalized_column():
+    database.save_appointment("alice@example.com", "90210", "2031-01-05 10:00")
+    database.save_appointment("bob@example.com", "90210", "2031-01-06 9am")
+    database.save_appointment("carol@example.com", "90210", "2031-01-07 10:00")
+    rows = database.appointments_between("2031-01-05", "2031-01-07", column="time")
+    assert [row[1] for row in rows] == ["alice@example.com", "bob@example.com"]
+    with database.connection() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM appointments WHERE scheduled_at >= ?",
+                            ("2031",)).fetchall()
+    assert "idx_appointments_scheduled_at" in str(plan)
+
+
+def test_migration_backfills_scheduled_at(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.execute("CREATE TABLE appointments (id INTEGER PRIMARY KEY, contact TEXT, zip_code TEXT, time TEXT)")
+    conn.execute("INSERT INTO appointments (contact, zip_code, time) VALUES ('x', '90210', '2030-03-04 11:00')")
+    database.init_db(conn)
+    assert conn.execute("SELECT scheduled_at FROM appointments").fetchone() == ("2030-03-04T11:00",)
@@ -0,0 +1,15 @@
+import json
+import logging
+
+import log_setup
+
+
+def test_use_log_file_switches_the_single_writer(tmp_path):
+    first, second = tmp_path / "first.log", tmp_path / "second.log"
+    log_setup.use_log_file(str(first))
+    logging.warning("before switch")
+    log_setup.use_log_file(str(second))
+    logging.warning("after switch")
+    log_setup.use_log_file(log_setup.LOG_FILE)
+    assert [json.loads(line)["msg"] for line in first.read_text().splitlines()] == ["before switch"]
+    assert [json.loads(line)["msg"] for line in second.read_text().splitlines()] == ["after switch"]
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+import rate_limit
+
+
+def test_cancelled_wait_returns_its_token():
+    bucket = rate_limit.TokenBucket(rate=1.0, burst=1)
+
+    async def scenario():
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert bucket.tokens > -0.5  # The cancelled reservation was given back
+
+
+def test_wait_beyond_max_wait_fails_fast_without_reserving():
+    bucket = rate_limit.TokenBucket(rate=1.0, burst=1)
+
+    async def scenario():
+        await bucket.acquire()
+        tokens = bucket.tokens
+        with pytest.raises(rate_limit.RateLimited):
+            await bucket.acquire(max_wait=0.5)
+        return tokens
+
+    tokens = asyncio.run(scenario())
+    assert bucket.tokens >= tokens
+
+
+def test_shared_buckets_draw_from_one_limit(tmp_path):
+    db_file = str(tmp_path / "limits.db")
+    # Two instances stand in for two worker processes
+    first = rate_limit.SharedTokenBucket("example.com", db_file, rate=1.0, burst=2)
+    second = rate_limit.SharedTokenBucket("example.com", db_file, rate=1.0, burst=2)
+    assert first._reserve() == 0.0
+    assert second._reserve() == 0.0
+    assert first._reserve(max_wait=0.5) is None
+    second._release()
+    assert first._reserve(max_wait=0.5) == 0.0
+
+
+def test_shared_bucket_reserves_off_the_event_loop(tmp_path):
+    bucket = rate_limit.SharedTokenBucket("example.com", str(tmp_path / "limits.db"), rate=1.0, burst=1)
+    loop_thread = []
+
+    def reserve(max_wait=None):
+        loop_thread.append(threading.current_thread() is threading.main_thread())
+        return 0.0
+
+    bucket._reserve = reserve
+    asyncio.run(bucket.acquire())
+    assert loop_thread == [False]
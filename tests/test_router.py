@@ -0,0 +1,119 @@
+import pytest
+
+import cache_store
+import router
+
+
+@pytest.fixture
+def bookings(monkeypatch):
+    """Record booking calls instead of writing to appointments.db."""
+    calls = []
+    monkeypatch.setattr(router, "book_appointment", lambda *args: calls.append(args) or "booked")
+    return calls
+
+
+def test_parse_labeled_vehicle():
+    parsed = router.parse_request("Make: Toyota, Model: Camry, Year: 2023, Size: 19-inch, Zip: 90210")
+    assert (parsed.intent, parsed.make, parsed.model, parsed.year, parsed.size, parsed.zip_code) == \
+        ("price", "Toyota", "Camry", "2023", "19-inch", "90210")
+
+
+def test_parse_free_text_booking():
+    parsed = router.parse_request("Book an appointment for tomorrow at 10am, contact jane@example.com, zip 90210")
+    assert parsed.intent == "booking"
+    assert parsed.contact == "jane@example.com"
+    assert parsed.time == "tomorrow at 10am"
+    assert parsed.zip_code == "90210"
+
+
+def test_explicit_booking_takes_fast_path(bookings):
+    assert router.route("Book an appointment for tomorrow at 10am, contact jane@example.com, zip 90210") == "booked"
+    assert bookings == [("jane@example.com", "90210", "tomorrow at 10am")]
+
+
+@pytest.mark.parametrize("text", [
+    "Can I cancel my appointment for tomorrow at 10am? phone 555-123-4567 zip 90210",
+    "Is 10am tomorrow free? my number is 555-123-4567, zip 90210",
+    "Please reschedule my booking to Friday 3pm, phone 555-123-4567, zip 90210",
+    "Don't book anything for tomorrow at 10am yet, contact jane@example.com, zip 90210",
+    "Can I book tomorrow at 10am? contact jane@example.com, zip 90210",
+    "My appointment is tomorrow at 10am, contact jane@example.com, zip 90210",
+    "Call me at 555-123-4567 about tomorrow at 10am, zip 90210",
+])
+def test_questions_negations_and_changes_go_to_llm(bookings, text):
+    assert router.route(text) is None
+    assert bookings == []
+
+
+@pytest.mark.parametrize("text", [
+    "Can I cancel my appointment for tomorrow at 10am? phone 555-123-4567 zip 90210",
+    "Is 10am tomorrow free? my number is 555-123-4567, zip 90210",
+])
+def test_is_booking_command_rejects_reviewed_cases(text):
+    assert not router.is_booking_command(text)
+
+
+def test_feature_question_goes_to_llm(monkeypatch):
+    monkeypatch.setattr(router, "quote_tire_prices", lambda *args: pytest.fail("quoted a feature question"))
+    assert router.route("Which Toyota Camry 2023 tyres are the quietest?") is None
+
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = router.TTLCache(max_size=16, ttl_seconds=60)
+    monkeypatch.setattr(router, "answer_cache", cache)
+    return cache
+
+
+def test_booking_answers_are_not_cached(answer_cache):
+    alice = "Toyota Camry 2023, can I book tomorrow at 10am? contact alice@example.com, zip 90210"
+    bob = "Toyota Camry 2023, can I book tomorrow at 10am? contact bob@example.com, zip 90210"
+    router.remember_answer(alice, "Booked for Alice")
+    assert router.cached_answer(bob) is None
+    assert router.cached_answer(alice) is None
+
+
+def test_side_effect_runs_are_not_cached(answer_cache):
+    text = "Which Toyota Camry 2023 tyres are the quietest?"
+    router.remember_answer(text, "Booked", calls=[("fetch_tire_prices", {}), ("schedule_appointment", {})])
+    assert router.cached_answer(text) is None
+    router.remember_answer(text, "The Michelin Primacy", calls=[("fetch_tire_prices", {})])
+    assert router.cached_answer(text) == "The Michelin Primacy"
+
+
+@pytest.mark.parametrize("text, model, terms", [
+    ("Toyota Camry 2023 prices", "Camry", ("prices",)),
+    ("Toyota RAV4 2023 18-inch snow tyres", "RAV4", ("snow",)),
+    ("Toyota Camry 2023 19-inch quietest", "Camry", ("quietest",)),
+    ("Tesla Model 3 2022 19-inch", "Model 3", ()),
+    ("Toyota Sienna snow 2020", "Sienna", ("snow",)),
+])
+def test_model_stops_before_question_words(text, model, terms):
+    parsed = router.parse_request(text)
+    assert parsed.model == model
+    assert parsed.terms == terms
+
+
+@pytest.mark.parametrize("text", ["Toyota RAV4 2023 18-inch snow tyres", "Toyota Camry 2023 19-inch quietest"])
+def test_trailing_feature_words_go_to_llm(monkeypatch, text):
+    monkeypatch.setattr(router, "quote_tire_prices", lambda *args: pytest.fail("quoted a feature question"))
+    assert router.route(text) is None
+
+
+def test_trailing_price_word_quotes_the_clean_model(monkeypatch):
+    quoted = []
+    monkeypatch.setattr(router, "quote_tire_prices", lambda *args: quoted.append(args) or "quoted")
+    assert router.route("Toyota Camry 2023 prices") == "quoted"
+    assert quoted == [("Toyota", "Camry", "2023", "unknown", "90210")]
+
+
+def test_answer_expires_with_the_entry_the_agent_fetched(answer_cache):
+    text = "Which Toyota Camry 2023 tyres are the quietest?"
+    args = {"make": "Toyota", "model": "Camry", "year": "2023", "size": "19-inch", "zip_code": "90210"}
+    price_key = cache_store.make_key(*args.values())
+    cache_store.put_entry(price_key, [], *args.values())
+    router.remember_answer(text, "The Michelin Primacy", calls=[("fetch_tire_prices", args)])
+    assert router.cached_answer(text) == "The Michelin Primacy"
+    with cache_store.connection() as conn, conn:  # The entry is refreshed
+        conn.execute("UPDATE price_cache SET timestamp = ? WHERE key = ?", ("2099-01-01T00:00:00", price_key))
+    assert router.cached_answer(text) is None
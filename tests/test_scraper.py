@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+import pytest
+
+import rate_limit
+import scraper
+import site_health
+import sites
+
+
+@pytest.fixture
+def throttled_site(monkeypatch):
+    """A retailer whose host has no token for the next second."""
+    adapter = sites.SITES["tirerack"]
+    url = adapter.build_url("Toyota", "Camry", "2023", "19", "90210")
+    bucket = rate_limit.TokenBucket(rate=1.0, burst=1)
+    bucket.tokens = 0.0
+    monkeypatch.setitem(rate_limit._buckets, rate_limit.host_key(url), bucket)
+    return adapter, url
+
+
+def _health(site):
+    return site_health.get_breaker(site).failures, site_health.get_stats(site).failures
+
+
+def test_cancelled_while_rate_limited_is_not_a_site_failure(throttled_site):
+    adapter, url = throttled_site
+    before = _health(adapter.name)
+
+    async def scenario():
+        task = asyncio.ensure_future(scraper._guarded_scrape(None, adapter, url, max_wait=5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert _health(adapter.name) == before
+
+
+def test_unreachable_token_skips_the_site(throttled_site):
+    adapter, url = throttled_site
+    before = _health(adapter.name)
+    assert asyncio.run(scraper._guarded_scrape(None, adapter, url, max_wait=0.1)) == (adapter.name, [])
+    assert _health(adapter.name) == before
+
+
+def test_fallback_is_not_persisted(monkeypatch):
+    async def no_listings(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(scraper, "async_scrape_prices", no_listings)
+    monkeypatch.setattr(scraper, "QUEUE_MODE", False)
+    key = scraper.cache_store.make_key("Nocar", "Nomodel", "1901", "13", "00000")
+    listings = scraper._load_tire_prices(key, "Nocar", "Nomodel", "1901", "13", "00000")
+    assert [listing.site for listing in listings] == ["fallback"]
+    assert scraper.cache_store.get_entry(key) is None
+    assert scraper.price_lru.get(key) is None
+
+
+def test_warm_concurrency_is_capped_by_host_burst():
+    bursts = [rate_limit.get_bucket(rate_limit.host_key(adapter.url_template)).burst for adapter in sites.SITES.values()]
+    assert scraper.warm_concurrency(100) == min(bursts)
+    assert scraper.warm_concurrency(1) == 1
+
+
+def test_refresh_keeps_fuller_stale_entry(monkeypatch):
+    params = ("Nocar", "Refresh", "1902", "13", "00000")
+    key = scraper.cache_store.make_key(*params)
+    stale = [sites.Listing(f"Tyre {site}", "Brand", "13", 100.0, site) for site in ("tirerack", "simpletire")]
+    scraper.cache_store.put_entry(key, [listing.to_dict() for listing in stale], *params)
+    deadlines = []
+
+    async def one_site(*args, deadline=scraper.SCRAPE_DEADLINE_SECONDS):
+        deadlines.append(deadline)
+        return [sites.Listing("New tyre", "Brand", "13", 90.0, "tirerack")]
+
+    monkeypatch.setattr(scraper, "async_scrape_prices", one_site)
+    assert asyncio.run(scraper.async_refresh_entry(*params)) is False
+    assert deadlines == [None]
+    assert len(scraper.cache_store.peek_prices(key)) == 2
+
+
+def test_limiter_error_releases_the_breaker(monkeypatch):
+    adapter = sites.SITES["tirerack"]
+    url = adapter.build_url("Toyota", "Camry", "2023", "19", "90210")
+
+    async def locked(url, max_wait=None):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(rate_limit, "acquire", locked)
+    breaker = site_health.get_breaker(adapter.name)
+    monkeypatch.setattr(breaker, "_probing", True)  # A half-open probe in flight
+    assert asyncio.run(scraper._guarded_scrape(None, adapter, url)) == (adapter.name, [])
+    assert breaker._probing is False
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sqlite_pool import ConnectionPool
+
+
+def _pool(opened, size=4):
+    def connect():
+        opened.append(sqlite3.connect("pool.db", check_same_thread=False))
+        return opened[-1]
+    return ConnectionPool(connect, init=lambda conn: conn.execute("CREATE TABLE IF NOT EXISTS t (x)"), size=size)
+
+
+def test_connections_are_reused_across_threads():
+    opened = []
+    pool = _pool(opened)
+
+    def rerun():  # Like a Streamlit rerun: a new thread each time
+        with pool.connection() as conn:
+            conn.execute("SELECT COUNT(*) FROM t").fetchone()
+
+    for _ in range(5):
+        thread = threading.Thread(target=rerun)
+        thread.start()
+        thread.join()
+    assert len(opened) == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    opened = []
+    pool = _pool(opened)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+
+
+def test_connections_beyond_the_pool_size_are_closed():
+    opened = []
+    pool = _pool(opened, size=1)
+    with pool.connection(), pool.connection():
+        pass
+    assert len(opened) == 2
+    with pool.connection() as conn:
+        assert conn is opened[1]
+    with pytest.raises(sqlite3.ProgrammingError):  # The surplus connection was closed
+        opened[0].execute("SELECT 1")